@@ -0,0 +1,207 @@
+"""
+Headless Batch Generation
+
+Turns a CSV or JSONL list of careers URLs / job descriptions into cold
+emails without the Streamlit UI. Results are appended to a JSONL file as
+soon as each item finishes, and finished item ids go to a checkpoint file,
+so an interrupted run picks up where it stopped.
+
+Usage:
+    python app/batch.py inputs.jsonl -o emails.jsonl [--workers 4]
+
+Each input row needs a ``url`` or a ``text`` (alias ``description``) field
+and may carry an ``id``; rows without one are identified by a hash of
+their content. Rows that can't be read are reported as failed results and
+the run carries on.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pipeline import generate_emails  # noqa: E402
+from resources import DEFAULT_PORTFOLIO_PATH as DEFAULT_PORTFOLIO, get_chain, get_portfolio  # noqa: E402
+from tenants import normalize_tenant  # noqa: E402
+
+
+def item_id(item):
+    """Stable identifier for an input row."""
+    if item.get("id"):
+        return str(item["id"])
+    source = item.get("url") or item.get("text") or ""
+    return hashlib.sha1(source.strip().encode("utf-8")).hexdigest()
+
+
+def _parse_row(row):
+    """Normalize one input row, or explain why it can't be processed."""
+    if not isinstance(row, dict):
+        return None, f"expected an object, got {type(row).__name__}"
+    fields = {"url": row.get("url"), "text": row.get("text") or row.get("description")}
+    for name, value in fields.items():
+        if value is not None and not isinstance(value, str):
+            return None, f"{name!r} must be a string, got {type(value).__name__}"
+    item = {
+        "url": (fields["url"] or "").strip() or None,
+        "text": (fields["text"] or "").strip() or None,
+        "id": row.get("id"),
+    }
+    if not (item["url"] or item["text"]):
+        return None, None
+    item["id"] = item_id(item)
+    return item, None
+
+
+def read_items(path):
+    """Yield normalized ``{"id", "url", "text"}`` dicts from a CSV or JSONL file.
+
+    Rows that can't be processed (invalid JSON, not an object, non-string
+    fields) are yielded with an ``error`` instead, identified by line number.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            rows = ((None, row) for row in csv.DictReader(f))
+        else:
+            rows = ((number, line) for number, line in enumerate(f, 1) if line.strip())
+        for number, row in rows:
+            if number is not None:
+                try:
+                    row = json.loads(row)
+                except ValueError as e:
+                    yield {"id": f"line {number}", "url": None, "text": None, "error": f"invalid JSON: {e}"}
+                    continue
+            item, error = _parse_row(row)
+            if error:
+                yield {"id": f"line {number}", "url": None, "text": None, "error": error}
+            elif item:
+                yield item
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+class ResultWriter:
+    """Appends results and checkpoint entries, flushing after every item."""
+
+    def __init__(self, output_path, checkpoint_path):
+        self._lock = threading.Lock()
+        self._output = open(output_path, "a", encoding="utf-8")
+        self._checkpoint = open(checkpoint_path, "a", encoding="utf-8")
+
+    def write(self, record, done):
+        with self._lock:
+            self._output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._output.flush()
+            if done:
+                # Only checkpoint after the result itself is on disk
+                self._checkpoint.write(record["id"] + "\n")
+                self._checkpoint.flush()
+
+    def close(self):
+        self._output.close()
+        self._checkpoint.close()
+
+
+def process_item(chain, portfolio, item, use_cache, email_workers):
+    started = time.perf_counter()
+    try:
+        results = generate_emails(chain, portfolio, url=item["url"], text=item["text"],
+                                  use_cache=use_cache, max_workers=email_workers)
+    except Exception as e:
+        return {"id": item["id"], "url": item["url"], "status": "error", "error": str(e),
+                "elapsed": round(time.perf_counter() - started, 3)}, False
+    return {"id": item["id"], "url": item["url"], "status": "ok", "results": results,
+            "elapsed": round(time.perf_counter() - started, 3)}, True
+
+
+def run_batch(input_path, output_path, checkpoint_path=None, workers=4, email_workers=None,
+              portfolio_path=DEFAULT_PORTFOLIO, use_cache=True, tenant=None):
+    """Process every unfinished input item; returns ``(succeeded, failed, skipped)``."""
+    checkpoint_path = checkpoint_path or output_path + ".checkpoint"
+    finished = load_checkpoint(checkpoint_path)
+    chain = get_chain()
+    portfolio = get_portfolio(portfolio_path, tenant=normalize_tenant(tenant) if tenant else None)
+    writer = ResultWriter(output_path, checkpoint_path)
+
+    succeeded = failed = skipped = 0
+    pending = set()
+
+    def report(record, ok):
+        nonlocal succeeded, failed
+        writer.write(record, done=ok)
+        succeeded += ok
+        failed += not ok
+        print(f"[{record['status']}] {record['id']} ({record['elapsed']}s)", file=sys.stderr)
+
+    def drain():
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.discard(future)
+            report(*future.result())
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for item in read_items(input_path):
+            if item.get("error"):
+                report({"id": item["id"], "url": None, "status": "error", "error": item["error"],
+                        "elapsed": 0.0}, False)
+                continue
+            if item["id"] in finished:
+                skipped += 1
+                continue
+            finished.add(item["id"])  # also skips duplicate rows within this run
+            # Keep a bounded window in flight so huge inputs aren't all queued at once
+            if len(pending) >= workers * 2:
+                drain()
+            pending.add(executor.submit(process_item, chain, portfolio, item, use_cache, email_workers))
+        while pending:
+            drain()
+    finally:
+        # On an interrupt, drop queued items and keep whatever already finished;
+        # items still running are redone on the next run
+        executor.shutdown(wait=False, cancel_futures=True)
+        for future in [future for future in pending if future.done() and not future.cancelled()]:
+            pending.discard(future)
+            report(*future.result())
+        writer.close()
+    return succeeded, failed, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate cold emails for a list of careers URLs or job descriptions.")
+    parser.add_argument("input", help="CSV or JSONL file with url / text columns")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file results are appended to")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--workers", type=int, default=4, help="items processed concurrently")
+    parser.add_argument("--email-workers", type=int, default=None, help="emails written concurrently per item")
+    parser.add_argument("--portfolio", default=DEFAULT_PORTFOLIO, help="portfolio CSV")
+    parser.add_argument("--tenant", help="tenant the portfolio belongs to (keeps its index and reuse separate)")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the LLM response cache")
+    args = parser.parse_args(argv)
+
+    succeeded, failed, skipped = run_batch(
+        args.input, args.output,
+        checkpoint_path=args.checkpoint,
+        workers=max(args.workers, 1),
+        email_workers=args.email_workers,
+        portfolio_path=args.portfolio,
+        use_cache=not args.no_cache,
+        tenant=args.tenant,
+    )
+    print(f"Done: {succeeded} succeeded, {failed} failed, {skipped} already finished", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,196 @@
 import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from langchain_groq import ChatGroq
 from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.exceptions import OutputParserException
 from dotenv import load_dotenv
 
+from metrics import REGISTRY
+from scheduler import get_scheduler
+from snapshot import resolve_path
+from tolerant_json import salvage_json
+from utils import estimate_tokens, split_into_chunks
+
 load_dotenv()
 
+# Largest page (in estimated tokens) sent to extract_jobs in one prompt;
+# bigger pages are split into chunks that are extracted in parallel
+MAX_EXTRACT_TOKENS = int(os.getenv("MAX_EXTRACT_TOKENS", "4000"))
+EXTRACT_CONCURRENCY = int(os.getenv("EXTRACT_CONCURRENCY", "4"))
+# Repair calls allowed per extraction response for fragments that don't parse
+EXTRACT_MAX_REPAIRS = int(os.getenv("EXTRACT_MAX_REPAIRS", "2"))
+
+LLM_CACHE_PATH = resolve_path(os.getenv("LLM_CACHE_PATH", ".cache/llm_responses.sqlite3"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+
+class ResponseCache:
+    """Disk-backed LLM response cache with TTL and size-based eviction.
+
+    Entries live in a small SQLite file keyed by a hash of the model name,
+    rendered prompt and generation parameters. Expired entries are dropped
+    on read; once ``max_entries`` is exceeded the least recently used ones
+    are evicted.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl_seconds=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model, prompt, params):
+        payload = json.dumps({"model": model, "prompt": prompt, "params": params}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                REGISTRY.inc("llm_cache_requests_total", result="miss")
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            REGISTRY.inc("llm_cache_requests_total", result="hit")
+            return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": size}
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Process-wide response cache, or None when LLM_CACHE_DISABLED is set."""
+    global _default_cache
+    if os.getenv("LLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+        return _default_cache
+
 class Chain:
-    def __init__(self):
-        self.llm = ChatGroq(temperature=0, groq_api_key=os.getenv("GROQ_API_KEY"), model_name="llama-3.1-70b-versatile")
+    def __init__(self, api_key=None, cache=None, llm=None, scheduler=None):
+        if llm is None:
+            api_key = api_key or os.getenv("GROQ_API_KEY")
+            # Retries and rate limits are handled by the scheduler
+            llm = ChatGroq(temperature=0, groq_api_key=api_key, model_name="llama-3.1-70b-versatile", max_retries=0)
+        self.llm = llm
+        self.cache = cache if cache is not None else get_response_cache()
+        self.scheduler = scheduler or get_scheduler()
+
+    def _cache_key(self, prompt):
+        params = {"temperature": getattr(self.llm, "temperature", None),
+                  "max_tokens": getattr(self.llm, "max_tokens", None)}
+        model = getattr(self.llm, "model_name", type(self.llm).__name__)
+        return ResponseCache.make_key(model, prompt, params)
+
+    def _complete(self, prompt, use_cache=True):
+        """Return the completion for a rendered prompt, via the response cache.
+
+        The same key coalesces identical in-flight prompts in the scheduler;
+        ``use_cache=False`` opts out of both.
+        """
+        key = self._cache_key(prompt) if use_cache else None
+        if key is not None and self.cache is not None:
+            content = self.cache.get(key)
+            if content is not None:
+                return content
+        content = self.scheduler.invoke(self.llm, prompt, key=key).content
+        if key is not None and self.cache is not None:
+            self.cache.set(key, content)
+        return content
+
+    def _stream(self, prompt, use_cache=True):
+        """Stream the completion for a rendered prompt, via the response cache."""
+        key = self._cache_key(prompt) if use_cache else None
+        if key is not None and self.cache is not None:
+            content = self.cache.get(key)
+            if content is not None:
+                yield content
+                return
+        parts = []
+        for text in self.scheduler.stream(self.llm, prompt, key=key):
+            parts.append(text)
+            yield text
+        if key is not None and self.cache is not None:
+            self.cache.set(key, "".join(parts))
+
+    def extract_jobs(self, cleaned_text, max_chunk_tokens=MAX_EXTRACT_TOKENS, use_cache=True):
+        """Extract job postings, splitting oversized pages into parallel chunks."""
+        if estimate_tokens(cleaned_text) <= max_chunk_tokens:
+            return self._extract_chunk(cleaned_text, use_cache)
 
-    def extract_jobs(self, cleaned_text):
+        chunks = split_into_chunks(cleaned_text, max_chunk_tokens)
+        with ThreadPoolExecutor(max_workers=max(min(EXTRACT_CONCURRENCY, len(chunks)), 1)) as executor:
+            futures = [executor.submit(self._extract_chunk, chunk, use_cache) for chunk in chunks]
+
+        partials = []
+        for future in futures:
+            try:
+                partials.append(future.result())
+            except OutputParserException:
+                # A chunk without parseable postings shouldn't sink the whole page
+                continue
+        if not partials:
+            raise OutputParserException("Context too big. Unable to parse jobs.")
+        return merge_jobs(partials)
+
+    def _extract_chunk(self, cleaned_text, use_cache=True):
+        """Extract jobs from one prompt-sized text.
+
+        Malformed output is salvaged object by object; fragments that still
+        don't parse get one small repair call each, instead of re-running
+        the extraction.
+        """
         prompt_extract = PromptTemplate.from_template(
             """
             ### SCRAPED TEXT FROM WEBSITE:
@@ -23,16 +202,50 @@ class Chain:
             ### VALID JSON (NO PREAMBLE):
             """
         )
-        chain_extract = prompt_extract | self.llm
-        res = chain_extract.invoke(input={"page_data": cleaned_text})
-        try:
-            json_parser = JsonOutputParser()
-            res = json_parser.parse(res.content)
-        except OutputParserException:
+        content = self._complete(prompt_extract.format(page_data=cleaned_text), use_cache)
+        salvaged = salvage_json(content)
+        if salvaged.clean:
+            REGISTRY.inc("extract_parse_total", result="clean")
+            return salvaged.objects
+
+        jobs = list(salvaged.objects)
+        REGISTRY.inc("extract_jobs_recovered_total", len(jobs), method="salvage")
+        repaired = 0
+        for fragment in salvaged.broken[:EXTRACT_MAX_REPAIRS]:
+            fixed = self._repair_fragment(fragment, use_cache)
+            jobs.extend(fixed)
+            repaired += len(fixed)
+        REGISTRY.inc("extract_jobs_recovered_total", repaired, method="repair")
+
+        if not jobs:
+            REGISTRY.inc("extract_parse_total", result="failed")
             raise OutputParserException("Context too big. Unable to parse jobs.")
-        return res if isinstance(res, list) else [res]
+        REGISTRY.inc("extract_parse_total", result="repaired" if repaired else "salvaged")
+        return jobs
+
+    def _repair_fragment(self, fragment, use_cache=True):
+        """Ask the model to fix one malformed job object; returns the jobs it yields."""
+        prompt_repair = PromptTemplate.from_template(
+            """
+            ### MALFORMED JSON:
+            {fragment}
+            ### INSTRUCTION:
+            The text above is a job posting object with the keys `role`, `experience`, `skills` and `description` that is not valid JSON, or was cut off.
+            Return it as one valid JSON object. Keep the existing values; do not invent missing content, close cut-off strings instead.
+            ### VALID JSON (NO PREAMBLE):
+            """
+        )
+        try:
+            content = self._complete(prompt_repair.format(fragment=fragment), use_cache)
+        except Exception:
+            # The salvaged jobs are still worth returning
+            REGISTRY.inc("extract_repairs_total", result="error")
+            return []
+        jobs = salvage_json(content).objects
+        REGISTRY.inc("extract_repairs_total", result="ok" if jobs else "failed")
+        return jobs
 
-    def write_mail(self, job, links):
+    def _email_prompt(self, job, links):
         prompt_email = PromptTemplate.from_template(
             """
             ### JOB DESCRIPTION:
@@ -52,9 +265,57 @@ class Chain:
 
             """
         )
-        chain_email = prompt_email | self.llm
-        res = chain_email.invoke({"job_description": str(job), "link_list": links})
-        return res.content
+        return prompt_email.format(job_description=str(job), link_list=links)
+
+    def write_mail(self, job, links, use_cache=True):
+        return self._complete(self._email_prompt(job, links), use_cache)
+
+    def stream_mail(self, job, links, use_cache=True):
+        """Yield the email text chunk by chunk as the model produces it."""
+        yield from self._stream(self._email_prompt(job, links), use_cache)
+
+
+def _normalize(value):
+    if isinstance(value, (list, tuple)):
+        value = ", ".join(str(item) for item in value)
+    return " ".join(str(value or "").lower().split())
+
+
+def merge_jobs(partials):
+    """Merge per-chunk job lists into one list without duplicates.
+
+    Jobs with the same role and experience are merged when one non-empty
+    description contains the other (a posting cut across chunks, or
+    repeated teaser text); their skills are unioned and the longer
+    description is kept.
+    """
+    merged = []
+    for jobs in partials:
+        for job in jobs:
+            if not isinstance(job, dict):
+                continue
+            role, experience = _normalize(job.get("role")), _normalize(job.get("experience"))
+            description = _normalize(job.get("description"))
+            for existing in merged:
+                other = _normalize(existing.get("description"))
+                if (_normalize(existing.get("role")) == role
+                        and _normalize(existing.get("experience")) == experience
+                        and description and other
+                        and (description in other or other in description)):
+                    skills = existing.get("skills") or []
+                    if isinstance(skills, str):
+                        skills = [skills]
+                    new_skills = job.get("skills") or []
+                    if isinstance(new_skills, str):
+                        new_skills = [new_skills]
+                    existing["skills"] = list(dict.fromkeys([*skills, *new_skills]))
+                    if len(description) > len(other):
+                        existing["description"] = job.get("description")
+                    break
+            else:
+                merged.append(dict(job))
+    return merged
+
 
 if __name__ == "__main__":
     print(os.getenv("GROQ_API_KEY"))
\ No newline at end of file
@@ -0,0 +1,256 @@
+"""
+Job Deduplication
+
+Careers pages repeat the same role, and batch runs reach the same posting
+through different URLs. Each extracted job is reduced to a normalized
+content fingerprint (exact duplicates) and a MinHash signature over its
+skills and description (near duplicates: same role, estimated Jaccard
+similarity at or above ``DEDUPE_THRESHOLD``).
+
+Within a request only the first of each group of duplicates gets an email.
+Across requests and runs, jobs that already got an email are looked up in a
+SQLite registry (candidates found by locality-sensitive hashing of their
+signatures) and reuse it. Records older than ``DEDUPE_TTL`` are deleted, and
+beyond ``DEDUPE_MAX_ENTRIES`` the oldest ones go first.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from lazy import lazy_import
+from metrics import REGISTRY
+from snapshot import resolve_path
+
+DEDUPE_THRESHOLD = float(os.getenv("DEDUPE_THRESHOLD", "0.8"))
+DEDUPE_REGISTRY_PATH = resolve_path(os.getenv("DEDUPE_REGISTRY_PATH", ".cache/jobs.sqlite3"))
+DEDUPE_TTL = int(os.getenv("DEDUPE_TTL", str(30 * 24 * 3600)))
+DEDUPE_MAX_ENTRIES = int(os.getenv("DEDUPE_MAX_ENTRIES", "10000"))
+
+NUM_PERM = 64
+BANDS = 16  # LSH bands of NUM_PERM // BANDS rows each
+# (a * h + b) mod p permutations; with p = 2**31 - 1 the products fit in uint64
+_PRIME = (1 << 31) - 1
+_PERMUTATIONS = [
+    (int.from_bytes(hashlib.sha256(f"a{i}".encode()).digest()[:4], "big") % (_PRIME - 1) + 1,
+     int.from_bytes(hashlib.sha256(f"b{i}".encode()).digest()[:4], "big") % _PRIME)
+    for i in range(NUM_PERM)
+]
+_ROLE_ALIASES = {"sr": "senior", "jr": "junior", "snr": "senior", "mgr": "manager", "eng": "engineer",
+                 "dev": "developer", "swe": "software engineer"}
+_WORD = re.compile(r"[a-z0-9+#]+")
+
+
+def _words(value):
+    if isinstance(value, (list, tuple)):
+        value = " ".join(str(item) for item in value)
+    return _WORD.findall(str(value or "").lower())
+
+
+def normalize_role(role):
+    return " ".join(_ROLE_ALIASES.get(word, word) for word in _words(role))
+
+
+def normalize_skills(skills):
+    if isinstance(skills, str):
+        skills = skills.split(",")
+    return sorted({" ".join(_words(skill)) for skill in skills or []} - {""})
+
+
+@dataclass(frozen=True)
+class JobKey:
+    """Normalized identity of one extracted job."""
+    fingerprint: str
+    role: str
+    signature: Tuple[int, ...]
+
+    def bands(self):
+        rows = NUM_PERM // BANDS
+        return [hashlib.sha1(f"{band}:{self.signature[band * rows:(band + 1) * rows]}".encode()).hexdigest()
+                for band in range(BANDS)]
+
+
+def _minhash(shingles):
+    if not shingles:
+        return (0,) * NUM_PERM
+    np = lazy_import("numpy")
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "big") & _PRIME for s in shingles),
+        dtype=np.uint64, count=len(shingles))
+    a, b = _permutation_arrays()
+    return tuple(((a[:, None] * hashes[None, :] + b[:, None]) % _PRIME).min(axis=1).tolist())
+
+
+@functools.lru_cache(maxsize=None)
+def _permutation_arrays():
+    np = lazy_import("numpy")
+    return (np.array([a for a, _ in _PERMUTATIONS], dtype=np.uint64),
+            np.array([b for _, b in _PERMUTATIONS], dtype=np.uint64))
+
+
+def job_key(job):
+    role = normalize_role(job.get("role"))
+    skills = normalize_skills(job.get("skills"))
+    description = _words(job.get("description"))
+    experience = " ".join(_words(job.get("experience")))
+    fingerprint = hashlib.sha256(json.dumps([role, experience, skills, description]).encode("utf-8")).hexdigest()
+    # Skills as whole tokens, the description as word 3-grams
+    shingles = {f"skill:{skill}" for skill in skills}
+    shingles.update(" ".join(description[i:i + 3]) for i in range(max(len(description) - 2, 1)) if description)
+    return JobKey(fingerprint, role, _minhash(sorted(shingles)))
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two jobs' skills and descriptions."""
+    return sum(x == y for x, y in zip(a.signature, b.signature)) / NUM_PERM
+
+
+def is_duplicate(a, b, threshold=DEDUPE_THRESHOLD):
+    return a.fingerprint == b.fingerprint or (a.role == b.role and similarity(a, b) >= threshold)
+
+
+class JobRegistry:
+    """SQLite record of jobs that already got an email, for cross-run reuse."""
+
+    def __init__(self, path=DEDUPE_REGISTRY_PATH, ttl_seconds=DEDUPE_TTL, max_entries=DEDUPE_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "fingerprint TEXT PRIMARY KEY, role TEXT NOT NULL, signature TEXT NOT NULL, "
+            "job TEXT NOT NULL, links TEXT NOT NULL, email TEXT NOT NULL, source TEXT, created REAL NOT NULL, "
+            "scope TEXT NOT NULL DEFAULT '')"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "scope" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN scope TEXT NOT NULL DEFAULT ''")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS bands (band TEXT NOT NULL, fingerprint TEXT NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS bands_band ON bands (band)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS bands_fingerprint ON bands (fingerprint)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created)")
+        self._conn.commit()
+
+    def lookup(self, key, threshold=DEDUPE_THRESHOLD, scope=""):
+        """Return the stored ``{"job", "links", "email", "source"}`` for ``key``'s best match, if any.
+
+        Only emails recorded with the same ``scope`` (tenant and portfolio)
+        are reused, since their links come from that portfolio.
+        """
+        cutoff = time.time() - self.ttl_seconds
+        row_key = self._row_key(key, scope)
+        bands = key.bands()
+        with self._lock:
+            candidates = self._conn.execute(
+                "SELECT DISTINCT j.fingerprint, j.role, j.signature, j.job, j.links, j.email, j.source "
+                "FROM jobs j WHERE j.created >= ? AND j.scope = ? AND (j.fingerprint = ? OR j.fingerprint IN "
+                f"(SELECT fingerprint FROM bands WHERE band IN ({','.join('?' * len(bands))})))",
+                (cutoff, scope, row_key, *bands),
+            ).fetchall()
+        best, best_score = None, -1.0
+        for stored_key, role, signature, job, links, email, source in candidates:
+            exact = stored_key == row_key
+            other = JobKey(key.fingerprint if exact else stored_key, role, tuple(json.loads(signature)))
+            if not is_duplicate(key, other, threshold):
+                continue
+            score = 1.0 if exact else similarity(key, other)
+            if score > best_score:
+                best, best_score = {"job": json.loads(job), "links": json.loads(links),
+                                    "email": email, "source": source}, score
+        return best
+
+    @staticmethod
+    def _row_key(key, scope):
+        # One row per posting and scope, so a posting can have an email per portfolio
+        return f"{scope}/{key.fingerprint}" if scope else key.fingerprint
+
+    def record(self, key, job, links, email, source=None, scope=""):
+        row_key = self._row_key(key, scope)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM bands WHERE fingerprint = ?", (row_key,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (fingerprint, role, signature, job, links, email, source, created, scope) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (row_key, key.role, json.dumps(key.signature), json.dumps(job), json.dumps(links),
+                 email, source, now, scope),
+            )
+            self._conn.executemany("INSERT INTO bands (band, fingerprint) VALUES (?, ?)",
+                                   [(band, row_key) for band in key.bands()])
+            # Drop expired records, then the oldest beyond max_entries, along with their bands
+            self._conn.execute("DELETE FROM jobs WHERE created < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM jobs WHERE fingerprint IN ("
+                "SELECT fingerprint FROM jobs ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.execute("DELETE FROM bands WHERE fingerprint NOT IN (SELECT fingerprint FROM jobs)")
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs")
+            self._conn.execute("DELETE FROM bands")
+            self._conn.commit()
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def get_job_registry():
+    """Process-wide job registry, or None when DEDUPE_REGISTRY_DISABLED is set."""
+    global _default_registry
+    if os.getenv("DEDUPE_REGISTRY_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = JobRegistry()
+        return _default_registry
+
+
+@dataclass
+class DedupePlan:
+    """Which extracted jobs need an email and where the others get theirs from."""
+    keys: List[JobKey]
+    unique: List[int] = field(default_factory=list)
+    duplicate_of: Dict[int, int] = field(default_factory=dict)
+    reused: Dict[int, dict] = field(default_factory=dict)
+
+    def describe(self):
+        parts = []
+        if self.duplicate_of:
+            parts.append(f"{len(self.duplicate_of)} duplicate{'s' if len(self.duplicate_of) != 1 else ''}")
+        if self.reused:
+            parts.append(f"{len(self.reused)} seen before")
+        return ", ".join(parts) or None
+
+
+def plan_dedupe(jobs, registry=None, threshold=DEDUPE_THRESHOLD, scope=""):
+    """Group ``jobs`` into distinct postings, reusing emails ``registry`` holds for ``scope``."""
+    plan = DedupePlan(keys=[job_key(job) for job in jobs])
+    for index, key in enumerate(plan.keys):
+        original = next((first for first in plan.unique + list(plan.reused)
+                         if is_duplicate(key, plan.keys[first], threshold)), None)
+        if original is not None:
+            plan.duplicate_of[index] = original
+            continue
+        previous = registry.lookup(key, threshold, scope) if registry is not None else None
+        if previous is not None:
+            plan.reused[index] = previous
+        else:
+            plan.unique.append(index)
+    REGISTRY.inc("jobs_deduplicated_total", len(plan.duplicate_of), scope="request")
+    REGISTRY.inc("jobs_deduplicated_total", len(plan.reused), scope="registry")
+    return plan
@@ -0,0 +1,243 @@
+"""
+Page Fetching with Conditional Revalidation
+
+Stores downloaded page bodies and their cleaned text in a SQLite cache.
+Repeat fetches send ``If-None-Match`` / ``If-Modified-Since``; when the
+server answers 304, or returns a body identical to the cached one, the
+cached cleaned text is reused as-is, so downstream prompts (and the LLM
+response cache keyed on them) stay byte-for-byte stable. Pages not fetched
+for ``PAGE_CACHE_TTL`` seconds expire, and beyond ``PAGE_CACHE_MAX_ENTRIES``
+the least recently fetched ones are evicted.
+"""
+
+import codecs
+import os
+import re
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import REGISTRY
+from snapshot import resolve_path
+from utils import clean_text
+
+PAGE_CACHE_PATH = resolve_path(os.getenv("PAGE_CACHE_PATH", ".cache/pages.sqlite3"))
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", str(30 * 24 * 3600)))
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "2000"))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "20"))
+# Concurrent requests allowed to one host, and keep-alive connections pooled per host
+FETCH_PER_HOST = int(os.getenv("FETCH_PER_HOST", "2"))
+FETCH_POOL_HOSTS = int(os.getenv("FETCH_POOL_HOSTS", "32"))
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+    ),
+}
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([a-zA-Z0-9_.:-]+)""", re.IGNORECASE)
+
+
+@dataclass
+class FetchedPage:
+    """A fetched page; ``cleaned`` is filled from cache or by :meth:`PageFetcher.clean`."""
+    url: str
+    body: str
+    body_hash: str
+    cleaned: Optional[str] = None
+    from_cache: bool = False
+
+    @cached_property
+    def text(self):
+        """Visible page text; only parsed when the cleaned text isn't cached."""
+        return html_to_text(self.body)
+
+
+class PageCache:
+    """SQLite store of page bodies, validators and cleaned text per URL."""
+
+    def __init__(self, path=PAGE_CACHE_PATH, ttl_seconds=PAGE_CACHE_TTL, max_entries=PAGE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body BLOB NOT NULL, "
+            "body_hash TEXT NOT NULL, cleaned TEXT, fetched REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, url):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, body, body_hash, cleaned, fetched FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            if row is not None and time.time() - row[5] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+                self._conn.commit()
+                row = None
+        if row is None:
+            return None
+        etag, last_modified, body, body_hash, cleaned, _ = row
+        return {
+            "etag": etag,
+            "last_modified": last_modified,
+            "body": zlib.decompress(body).decode("utf-8"),
+            "body_hash": body_hash,
+            "cleaned": cleaned,
+        }
+
+    def put(self, url, body, body_hash, etag=None, last_modified=None, cleaned=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, body, body_hash, cleaned, fetched) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, zlib.compress(body.encode("utf-8")), body_hash, cleaned, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM pages WHERE url IN ("
+                "SELECT url FROM pages ORDER BY fetched DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def touch(self, url):
+        """Mark a page as just revalidated, so it doesn't expire while the server keeps answering 304."""
+        with self._lock:
+            self._conn.execute("UPDATE pages SET fetched = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+
+    def set_cleaned(self, url, body_hash, cleaned):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET cleaned = ? WHERE url = ? AND body_hash = ?", (cleaned, url, body_hash)
+            )
+            self._conn.commit()
+
+
+def html_to_text(html):
+    """Extract visible text the same way WebBaseLoader does."""
+    from bs4 import BeautifulSoup
+
+    return BeautifulSoup(html, "html.parser").get_text()
+
+
+def decode_body(response):
+    """Response text, using the page's own charset when the header doesn't name one.
+
+    ``requests`` falls back to ISO-8859-1 for any ``text/*`` response without
+    a charset, which garbles UTF-8 pages; WebBaseLoader avoided that with
+    ``apparent_encoding``, and so do we after checking ``<meta charset>``.
+    """
+    if "charset" not in response.headers.get("Content-Type", "").lower():
+        match = _META_CHARSET.search(response.content[:4096])
+        encoding = None
+        if match:
+            try:
+                encoding = codecs.lookup(match.group(1).decode("ascii")).name
+            except LookupError:
+                pass
+        response.encoding = encoding or response.apparent_encoding or "utf-8"
+    return response.text
+
+
+def pooled_session(per_host=FETCH_PER_HOST, hosts=FETCH_POOL_HOSTS):
+    """A keep-alive ``requests`` session sized for concurrent fetching."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=hosts, pool_maxsize=per_host, pool_block=True)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+
+class PageFetcher:
+    """Fetches careers pages, revalidating cached copies with conditional GETs.
+
+    Safe to share between threads: requests go over one pooled keep-alive
+    session, and at most ``per_host`` of them hit the same host at once.
+    """
+
+    def __init__(self, cache=None, session=None, timeout=FETCH_TIMEOUT, per_host=FETCH_PER_HOST):
+        self.cache = cache if cache is not None else PageCache()
+        self.session = session or pooled_session(per_host)
+        self.timeout = timeout
+        self.per_host = per_host
+        self.revalidated = 0
+        self.downloaded = 0
+        self._host_slots = {}  # host -> [semaphore, fetches holding or waiting for it]
+        self._host_slots_lock = threading.Lock()
+
+    @contextmanager
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._host_slots_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = [threading.BoundedSemaphore(self.per_host), 0]
+            slot[1] += 1
+        try:
+            with slot[0]:
+                yield
+        finally:
+            with self._host_slots_lock:
+                slot[1] -= 1
+                # Drop idle hosts so a long-running server doesn't keep one per URL ever fetched
+                if not slot[1]:
+                    del self._host_slots[host]
+
+    def fetch(self, url):
+        """Return the page's text, reusing the cached copy if it hasn't changed."""
+        with self._host_slot(url):
+            return self._fetch(url)
+
+    def _fetch(self, url):
+        cached = self.cache.get(url)
+        headers = {}
+        if cached is not None:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and cached is not None:
+            self.revalidated += 1
+            REGISTRY.inc("page_cache_requests_total", result="not_modified")
+            self.cache.touch(url)
+            return FetchedPage(url, cached["body"], cached["body_hash"],
+                               cleaned=cached["cleaned"], from_cache=True)
+        response.raise_for_status()
+        self.downloaded += 1
+
+        body = decode_body(response)
+        body_hash = hashlib.sha256(body.encode("utf-8")).hexdigest()
+        unchanged = cached is not None and cached["body_hash"] == body_hash
+        REGISTRY.inc("page_cache_requests_total", result="unchanged" if unchanged else "downloaded")
+        cleaned = cached["cleaned"] if unchanged else None
+        self.cache.put(url, body, body_hash,
+                       etag=response.headers.get("ETag"),
+                       last_modified=response.headers.get("Last-Modified"),
+                       cleaned=cleaned)
+        return FetchedPage(url, body, body_hash, cleaned=cleaned, from_cache=unchanged)
+
+    def clean(self, page):
+        """Return the page's cleaned text, computing and storing it if needed."""
+        if page.cleaned is None:
+            page.cleaned = clean_text(page.text)
+            self.cache.set_cleaned(page.url, page.body_hash, page.cleaned)
+        return page.cleaned
@@ -0,0 +1,184 @@
+"""
+Portfolio Keyword Index
+
+Extracted skills are usually the same technology names the ``Techstack``
+column lists ("React", "Spring Boot"), so most of them can be matched
+without embedding anything. :class:`KeywordIndex` is built from the
+portfolio rows at load time and answers, with dictionary lookups only:
+
+- exact matches, after folding case and punctuation ("NodeJS", "node.js"
+  and "Node" all match "Node.js");
+- near-exact matches, where every word of the skill appears in one
+  Techstack entry ("Rails" matches "Ruby on Rails").
+
+Matching rows are ranked by BM25 over the Techstack words, with rows that
+list the skill exactly first. Skills it can't match are left to the vector
+index; :func:`fuse_rankings` merges both kinds of ranking with reciprocal
+rank fusion.
+
+Before any lookup, :class:`SkillMap` rewrites extracted skills to one
+canonical spelling: the Techstack entry they fold to, or a name from the
+alias file (``SKILL_ALIASES_PATH``, ``{"Kubernetes": ["k8s"], ...}``).
+When the portfolio lists any spelling of an alias group, that spelling is
+the canonical one.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+from collections import defaultdict
+
+from snapshot import resolve_path
+
+logger = logging.getLogger("cold_email.keyword_index")
+
+RRF_K = 60  # reciprocal rank fusion constant; larger values flatten rank differences
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+SKILL_ALIASES_PATH = os.getenv("SKILL_ALIASES_PATH", os.path.join("app", "resource", "skill_aliases.json"))
+
+_WORD = re.compile(r"[a-z0-9+#]+(?:\.[a-z0-9+#]+)*")
+_SPACE = re.compile(r"\s+")
+
+
+def skill_words(skill):
+    return _WORD.findall(str(skill).lower())
+
+
+def skill_keys(skill):
+    """Lookup keys for a skill: its letters and digits only, with and without a ``js`` suffix."""
+    folded = re.sub(r"[^a-z0-9+#]", "", str(skill).lower())
+    if not folded:
+        return ()
+    if folded.endswith("js") and len(folded) > 4:
+        return folded, folded[:-2]
+    return (folded,)
+
+
+def load_skill_aliases(path=None):
+    """Read ``{canonical name: [alias, ...]}`` from the alias file; a missing file means no aliases."""
+    path = resolve_path(path or SKILL_ALIASES_PATH)
+    try:
+        with open(path, encoding="utf-8") as f:
+            aliases = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring skill aliases in %s: %s", path, e)
+        return {}
+    if not isinstance(aliases, dict):
+        logger.warning("Ignoring skill aliases in %s: expected an object of name -> aliases", path)
+        return {}
+    return {str(name): [str(alias) for alias in (names if isinstance(names, list) else [names])]
+            for name, names in aliases.items()}
+
+
+class SkillMap:
+    """Canonical spelling for skills, from the portfolio's Techstack entries plus configured aliases."""
+
+    def __init__(self, rows, aliases=None):
+        entries = [_SPACE.sub(" ", skill.strip())
+                   for techstack, _ in rows.values() for skill in str(techstack).split(",") if skill.strip()]
+        self._canonical = {}
+        # Full folded spellings first, so "Next" can't be claimed by "Next.js" via its js-less key
+        for position in (0, 1):
+            for entry in entries:
+                keys = skill_keys(entry)
+                if len(keys) > position:
+                    self._canonical.setdefault(keys[position], entry)
+        # An alias group takes the portfolio's own spelling when any member appears in Techstack,
+        # so normalized skills still hit KeywordIndex's exact matches
+        techstack = dict(self._canonical)
+        for name, names in (aliases or {}).items():
+            group = [key for alias in [name, *names] for key in skill_keys(alias)]
+            target = next((techstack[key] for key in group if key in techstack), name)
+            for key in group:
+                if key not in techstack:
+                    self._canonical[key] = target
+
+    def __len__(self):
+        return len(self._canonical)
+
+    def normalize(self, skill):
+        """Canonical name for ``skill``; unknown skills just get their whitespace collapsed."""
+        skill = _SPACE.sub(" ", str(skill).strip())
+        for key in skill_keys(skill):
+            if key in self._canonical:
+                return self._canonical[key]
+        return skill
+
+    def normalize_all(self, skills):
+        """Sorted, case-insensitively distinct canonical names: the identity of a skill set."""
+        canonical = {}
+        for skill in skills:
+            name = self.normalize(skill)
+            canonical.setdefault(name.lower(), name)
+        return tuple(canonical[key] for key in sorted(canonical))
+
+
+class KeywordIndex:
+    """Inverted index over the comma-separated ``Techstack`` entries of portfolio rows."""
+
+    def __init__(self, rows):
+        """``rows`` maps row id to ``(techstack, links)``, as returned by ``portfolio_rows``."""
+        self.links = []
+        self._exact = defaultdict(set)        # skill key -> rows listing that skill
+        self._entries = defaultdict(set)      # word -> (row, entry) pairs containing it
+        self._postings = defaultdict(dict)    # word -> {row: term frequency}
+        self._lengths = []
+        for row, (techstack, links) in enumerate(rows.values()):
+            self.links.append(links)
+            words = []
+            for entry, skill in enumerate(str(techstack).split(",")):
+                for key in skill_keys(skill):
+                    self._exact[key].add(row)
+                for word in skill_words(skill):
+                    self._entries[word].add((row, entry))
+                    words.append(word)
+            for word in words:
+                self._postings[word][row] = self._postings[word].get(row, 0) + 1
+            self._lengths.append(len(words))
+        self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        count = len(self.links)
+        self._idf = {word: math.log(1 + (count - len(rows_) + 0.5) / (len(rows_) + 0.5))
+                     for word, rows_ in self._postings.items()}
+
+    def __len__(self):
+        return len(self.links)
+
+    def _bm25(self, words, row):
+        score = 0.0
+        for word in words:
+            frequency = self._postings.get(word, {}).get(row)
+            if frequency:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[row] / self._average_length)
+                score += self._idf[word] * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return score
+
+    def search(self, skill, n_results):
+        """Rank up to ``n_results`` links for ``skill``; an empty list means no keyword match."""
+        exact = set()
+        for key in skill_keys(skill):
+            exact |= self._exact.get(key, set())
+        words = skill_words(skill)
+        near = set()
+        if words:
+            entries = set.intersection(*(self._entries.get(word, set()) for word in words))
+            near = {row for row, _ in entries} - exact
+        if not exact and not near:
+            return []
+        ranked = sorted(exact, key=lambda row: (-self._bm25(words, row), row))
+        ranked += sorted(near, key=lambda row: (-self._bm25(words, row), row))
+        return list(dict.fromkeys(self.links[row] for row in ranked))[:n_results]
+
+
+def fuse_rankings(rankings, k=RRF_K):
+    """Merge ranked link lists with reciprocal rank fusion; ties keep first-seen order."""
+    scores = {}
+    for ranking in rankings:
+        for rank, link in enumerate(ranking):
+            scores[link] = scores.get(link, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda link: -scores[link])
@@ -0,0 +1,54 @@
+"""
+Lazy Imports
+
+The LLM, vector store and data stacks (langchain/Groq, chromadb, pandas,
+requests/bs4) take seconds to import, and demo mode needs none of them.
+They are imported on first real use through :func:`lazy_import`, which
+records how long each first import took for the debug panel and
+``/metrics``.
+
+Run ``python app/lazy.py`` to print the import cost of each heavy module.
+"""
+
+import importlib
+import sys
+import threading
+import time
+
+from metrics import REGISTRY
+
+# Modules the UI must not import at startup, in dependency order so each
+# reported time excludes the modules listed before it
+HEAVY_MODULES = ("fetch", "chromadb", "portfolio", "chains", "transcribe")
+
+_lock = threading.Lock()
+_import_times = {}
+
+
+def lazy_import(name):
+    """Import ``name`` on first use, recording how long the import took."""
+    # import_module rather than a sys.modules lookup: it waits for a module
+    # another thread is still initializing instead of returning it half-built
+    loaded = name in sys.modules
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    elapsed = time.perf_counter() - started
+    with _lock:
+        if not loaded and name not in _import_times:
+            _import_times[name] = elapsed
+            REGISTRY.observe("import_duration_seconds", elapsed, module=name)
+    return module
+
+
+def import_report():
+    """First-import durations recorded so far, slowest first."""
+    with _lock:
+        times = sorted(_import_times.items(), key=lambda item: item[1], reverse=True)
+    return [{"module": name, "seconds": round(seconds, 3)} for name, seconds in times]
+
+
+if __name__ == "__main__":
+    for name in HEAVY_MODULES:
+        lazy_import(name)
+    for row in import_report():
+        print(f"{row['module']:<12} {row['seconds']:>7.3f}s")
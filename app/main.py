@@ -1,12 +1,15 @@
 import streamlit as st
-from langchain_community.document_loaders import WebBaseLoader
 import os
-import time
 import json
 
-from chains import Chain
-from portfolio import Portfolio
-from utils import clean_text
+# Keep these imports light: chains, portfolio and their LLM / vector store
+# dependencies load on the first real generation (see lazy.py)
+from lazy import import_report, lazy_import
+from metrics import REGISTRY, start_metrics_server
+from pipeline import generate_emails, generate_emails_for_urls
+from resources import cleanup_tenants_in_background, get_chain, get_portfolio
+from snapshot import warm_up_in_background
+from tenants import authenticate_tenant, latest_portfolio, save_portfolio_upload, session_tenant, touch_tenant
 
 
 def inject_custom_css():
@@ -659,8 +662,8 @@ P.S. I've included links to my most relevant projects above. Happy to provide ad
 def get_mock_transcript_from_audio(audio_file) -> str:
     """Return a demo transcript for an uploaded audio file with enhanced validation.
 
-    This is a lightweight placeholder so the UI can show a transcript
-    without requiring an STT provider or extra dependencies.
+    Shown when the speech-to-text engine can't run (see transcribe.py), so
+    the UI still shows a transcript without an STT provider installed.
     """
     try:
         if not audio_file:
@@ -723,8 +726,138 @@ def validate_audio_file(audio_file) -> tuple[bool, str]:
         return False, f"File validation error: {str(e)}"
 
 
+def transcribe_upload(audio_file):
+    """Start transcribing an upload in the background (once per file); returns its job."""
+    jobs = st.session_state.setdefault("transcription_jobs", {})
+    job = jobs.get(audio_file.file_id)
+    if job is None:
+        job = lazy_import("transcribe").get_transcriber().submit(audio_file.getvalue(), audio_file.name)
+        jobs[audio_file.file_id] = job
+    return job
+
+
+@st.fragment(run_every=1.0)
+def show_transcription_progress(job):
+    """Poll a running transcription without blocking the page; rerun it once the transcript is ready."""
+    if job.done():
+        st.rerun()
+    chunks = f"{job.done_chunks}/{job.total_chunks} chunks" if job.total_chunks else "decoding"
+    st.progress(job.progress, text=f"🎧 Transcribing {job.filename}… ({chunks})")
+
+
+class ResultPanel:
+    """Progress bar plus one streaming email slot per job, for one input.
+
+    Slots are created once deduplication reports the job count, so emails
+    keep their order while filling in as they finish.
+    """
+
+    def __init__(self, title=None):
+        self.container = st.container()
+        with self.container:
+            if title:
+                st.markdown(f"#### 🔗 {title}")
+            self.progress_bar = st.progress(0)
+        self.email_slots = []
+        self.email_drafts = {}
+
+    def on_progress(self, event):
+        self.progress_bar.progress(event.fraction, text=event.message)
+        if event.stage == "dedupe" and event.status == "done":
+            with self.container:
+                for _ in range(event.job_count):
+                    st.markdown("### 📧 Generated Professional Email:")
+                    slot = st.empty()
+                    slot.info("⏳ Writing email...")
+                    self.email_slots.append(slot)
+
+    def on_token(self, index, text):
+        # Render the email as it streams in
+        self.email_drafts[index] = self.email_drafts.get(index, "") + text
+        self.email_slots[index].code(self.email_drafts[index] + " ▌", language='markdown')
+
+    def on_email(self, index, result):
+        with self.email_slots[index].container():
+            if "duplicate_of" in result:
+                st.caption(f"♻️ Same posting as email #{result['duplicate_of'] + 1}")
+            elif result.get("reused"):
+                st.caption("♻️ Written for this posting in an earlier run")
+            st.code(result["email"], language='markdown')
+
+    def finish(self):
+        self.progress_bar.empty()
+
+    def fail(self, error):
+        self.progress_bar.empty()
+        with self.container:
+            st.error(f"🚨 **Processing Error**: {str(error)}")
+
+
+def current_tenant():
+    """Tenant for this session: ?tenant=<id>&token=<token> in the URL, otherwise a private per-session id"""
+    if "tenant" not in st.session_state:
+        tenant = authenticate_tenant(st.query_params.get("tenant"), st.query_params.get("token"))
+        st.session_state.tenant = tenant or session_tenant()
+        st.session_state.tenant_from_url = tenant is not None
+        if st.query_params.get("tenant") and tenant is None:
+            st.session_state.tenant_rejected = True
+    return st.session_state.tenant
+
+
+def create_portfolio_uploader():
+    """Let each session use its own portfolio CSV; returns its path, or None for the default"""
+    tenant = current_tenant()
+    cleanup_tenants_in_background()
+    with st.expander("📁 Use your own portfolio"):
+        if st.session_state.get("tenant_rejected"):
+            st.caption("⚠️ The tenant link is missing a valid token; uploads stay private to this session")
+        uploaded = st.file_uploader(
+            "Portfolio CSV with Techstack and Links columns",
+            type=["csv"],
+            help="Links in generated emails will come from this portfolio instead of the default one"
+        )
+        if uploaded is not None:
+            try:
+                path = save_portfolio_upload(tenant, uploaded.getvalue())
+            except ValueError as e:
+                st.error(f"⚠️ {e}")
+                return None
+            except FileNotFoundError:
+                # Tenant cleanup removed the directory mid-save; the next rerun saves it again
+                st.warning("⚠️ Your uploaded portfolio expired while saving; using the default portfolio this time")
+                return None
+            touch_tenant(tenant)
+            st.caption(f"✓ Using **{uploaded.name}** for this session")
+            return path
+        # A returning tenant (?tenant=...&token=...) keeps its last upload
+        path = latest_portfolio(tenant) if st.session_state.tenant_from_url else None
+        if path:
+            touch_tenant(tenant)
+            st.caption(f"✓ Using the last portfolio uploaded for tenant **{tenant}**")
+        return path
+
+
+def create_debug_panel():
+    """Show per-stage timings and counters when DEBUG_METRICS is enabled"""
+    if os.getenv("DEBUG_METRICS", "").lower() not in ("1", "true", "yes"):
+        return
+    with st.expander("📊 Pipeline Metrics (debug)"):
+        snapshot = REGISTRY.snapshot()
+        st.markdown("**Stage timings**")
+        st.dataframe(snapshot["histograms"], use_container_width=True)
+        st.markdown("**Counters**")
+        st.dataframe(snapshot["counters"], use_container_width=True)
+        st.markdown("**Lazy imports**")
+        st.dataframe(import_report(), use_container_width=True)
+        st.code(REGISTRY.render_prometheus(), language="text")
+
+
 def create_streamlit_app():
     """Main Streamlit app with modern UI"""
+    # Serves /metrics in Prometheus format when METRICS_PORT is set
+    start_metrics_server()
+    if os.getenv("WARMUP_ON_START", "").lower() in ("1", "true", "yes"):
+        warm_up_in_background()
     inject_custom_css()
     create_modern_header()
     
@@ -739,6 +872,7 @@ def create_streamlit_app():
 
     # Shared state
     audio_file = None
+    transcription_job = None
     transcript_text = ""
 
     with tab_audio:
@@ -775,11 +909,25 @@ def create_streamlit_app():
         # Transcript section
         st.markdown("#### 📝 Transcript")
         
-        # Auto-generate transcript for demo if audio uploaded
+        # Transcribed in a background worker pool; the fragment polls until it's done
         if audio_file is not None and is_valid:
-            auto_transcript = get_mock_transcript_from_audio(audio_file)
+            transcription_job = transcribe_upload(audio_file)
+            if not transcription_job.done():
+                show_transcription_progress(transcription_job)
+                auto_transcript = ""
+                label = "Transcribing... type here meanwhile if you like"
+            else:
+                try:
+                    auto_transcript = transcription_job.future.result()
+                    label = "Transcribed text (edit if needed)"
+                    if not auto_transcript.strip():
+                        st.info("🔇 No speech was recognized in this recording")
+                except Exception as e:
+                    st.warning(f"⚠️ Speech-to-text unavailable ({e}) - showing a demo transcript")
+                    auto_transcript = get_mock_transcript_from_audio(audio_file)
+                    label = "Transcribed text (auto-generated in demo mode)"
             transcript_text = st.text_area(
-                "Transcribed text (auto-generated in demo mode)", 
+                label,
                 value=auto_transcript, 
                 height=160,
                 help="Edit this text or replace with your own transcript"
@@ -793,17 +941,26 @@ def create_streamlit_app():
             )
 
     with tab_url:
-        st.markdown("#### 🔗 Enter Job Posting URL or paste job description")
-        url_input = st.text_input(
-            "Job URL", 
+        st.markdown("#### 🔗 Enter Job Posting URLs or paste job description")
+        url_input = st.text_area(
+            "Job URLs (one per line)", 
             value="",
+            height=100,
             placeholder="https://company.com/careers/job-id",
-            help="Paste the URL of the job posting you want to apply for"
+            help="Paste one or more job posting URLs; each one is processed in parallel"
         )
 
         st.markdown("#### Or paste a job description / brief")
         pasted_text = st.text_area("Paste job description or role brief", value="", height=160)
 
+        bypass_cache = st.checkbox(
+            "Regenerate (skip cached responses)",
+            value=False,
+            help="Call the model again even if this exact request was answered before"
+        )
+
+    portfolio_path = create_portfolio_uploader()
+
     # Generate button centered
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
@@ -815,12 +972,17 @@ def create_streamlit_app():
         # Enhanced validation for voice AI agent
         has_audio = audio_file is not None
         has_transcript = transcript_text.strip() != ""
-        has_url = url_input and url_input.startswith(('http://', 'https://'))
+        urls = [line.strip() for line in url_input.splitlines()
+                if line.strip().startswith(('http://', 'https://'))]
+        has_url = bool(urls)
         has_text = 'pasted_text' in locals() and pasted_text.strip() != ""
         
         if not (has_audio or has_transcript or has_url or has_text):
             st.error("🎙️ **Please provide input**: Upload audio, enter text transcript, or provide a URL/job description")
             return
+        if has_audio and not has_transcript and transcription_job is not None and not transcription_job.done():
+            st.warning("🎧 Still transcribing your recording - generate again once the transcript appears")
+            return
         
         # Show enhanced loading animation for voice processing
         with st.container():
@@ -838,14 +1000,6 @@ def create_streamlit_app():
                 st.info("🔗 Analyzing job posting...")
             else:
                 st.info("✨ Processing your input...")
-            
-            # Simulate processing time with enhanced feedback
-            progress_bar = st.progress(0)
-            for i in range(100):
-                time.sleep(0.025)
-                progress_bar.progress(i + 1)
-            
-            progress_bar.empty()
         
         # Enhanced generation logic for voice AI
         try:
@@ -858,7 +1012,7 @@ def create_streamlit_app():
             elif has_transcript:
                 content_source = f"Text Input: {transcript_text}"
             elif has_url:
-                content_source = f"URL Analysis: {url_input}"
+                content_source = f"URL Analysis: {', '.join(urls)}"
             elif has_text:
                 content_source = f"Job Description: {pasted_text}"
             
@@ -890,34 +1044,56 @@ def create_streamlit_app():
                 
             else:
                 # Real mode - enhanced for voice input
-                from chains import Chain
-                from portfolio import Portfolio
-                
-                chain = Chain()
-                portfolio = Portfolio()
-                
-                if has_url:
-                    loader = WebBaseLoader([url_input])
-                    data = clean_text(loader.load().pop().page_content)
-                elif has_transcript or has_text:
-                    data = transcript_text or pasted_text
-                else:
-                    data = "No specific job posting provided"
-                
-                portfolio.load_portfolio()
-                jobs = chain.extract_jobs(data)
+                # Chain and portfolios are shared across sessions (see resources.py)
+                chain = get_chain(api_key)
+                portfolio = None
+                if portfolio_path:
+                    try:
+                        portfolio = get_portfolio(portfolio_path, tenant=current_tenant())
+                    except FileNotFoundError:
+                        # Tenant cleanup removed the upload since this page was loaded
+                        st.warning("⚠️ Your uploaded portfolio has expired; using the default portfolio. "
+                                   "Upload it again to use your own links.")
+                if portfolio is None:
+                    portfolio = get_portfolio()
                 
                 st.markdown('<div class="result-container">', unsafe_allow_html=True)
-                st.success("🎙️ **Voice AI Email Generated Successfully!**")
+                status_slot = st.empty()
                 st.info(f"**Input Source**: {content_source[:100]}...")
                 
-                for job in jobs:
-                    skills = job.get('skills', [])
-                    links = portfolio.query_links(skills)
-                    email = chain.write_mail(job, links)
-                    
-                    st.markdown("### 📧 Generated Professional Email:")
-                    st.code(email, language='markdown')
+                if has_url:
+                    # One progress row per URL; pages are fetched and processed concurrently
+                    panels = [ResultPanel(url) for url in urls]
+                    outcomes = generate_emails_for_urls(
+                        chain,
+                        portfolio,
+                        urls,
+                        on_progress=lambda i, event: panels[i].on_progress(event),
+                        on_email=lambda i, index, result: panels[i].on_email(index, result),
+                        on_token=lambda i, index, text: panels[i].on_token(index, text),
+                        on_error=lambda i, error: panels[i].fail(error),
+                        use_cache=not bypass_cache,
+                    )
+                    for panel in panels:
+                        panel.finish()
+                    failed = sum(isinstance(outcome, Exception) for outcome in outcomes)
+                    if failed:
+                        status_slot.warning(f"⚠️ **{len(urls) - failed} of {len(urls)} URLs processed successfully**")
+                    else:
+                        status_slot.success("🎙️ **Voice AI Email Generated Successfully!**")
+                else:
+                    panel = ResultPanel()
+                    generate_emails(
+                        chain,
+                        portfolio,
+                        text=transcript_text or pasted_text,
+                        on_progress=panel.on_progress,
+                        on_email=panel.on_email,
+                        on_token=panel.on_token,
+                        use_cache=not bypass_cache,
+                    )
+                    panel.finish()
+                    status_slot.success("🎙️ **Voice AI Email Generated Successfully!**")
                 
                 st.markdown('</div>', unsafe_allow_html=True)
                 
@@ -925,6 +1101,8 @@ def create_streamlit_app():
             st.error(f"🚨 **Processing Error**: {str(e)}")
             st.info("💡 **Tip**: Ensure your audio is clear, transcript is complete, or URL is accessible.")
 
+    create_debug_panel()
+
 
 if __name__ == "__main__":
     st.set_page_config(
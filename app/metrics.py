@@ -0,0 +1,200 @@
+"""
+Pipeline Metrics
+
+Process-wide counters and latency histograms for the generation pipeline,
+exported in Prometheus text format and as structured JSON log lines.
+
+Set ``METRICS_PORT`` to serve ``/metrics`` over HTTP, ``METRICS_LOG=1`` to
+print one JSON line per stage to stderr, and ``DEBUG_METRICS=1`` to show the
+debug panel in the Streamlit UI.
+"""
+
+import bisect
+import functools
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("cold_email.metrics")
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+HELP = {
+    "stage_duration_seconds": "Time spent in each pipeline stage.",
+    "stage_errors_total": "Pipeline stages that raised an exception.",
+    "requests_total": "Pipeline runs by outcome.",
+    "jobs_per_page": "Jobs extracted per page or pasted description.",
+    "emails_total": "Emails generated.",
+    "jobs_deduplicated_total": "Extracted jobs that reused another job's email, by scope.",
+    "extract_prompt_tokens_total": "Estimated page tokens sent to extract_jobs.",
+    "extract_prompt_tokens_saved_total": "Estimated page tokens removed by pruning before extract_jobs.",
+    "extract_parse_total": "Extraction responses by how they were parsed (clean, salvaged, repaired, failed).",
+    "extract_jobs_recovered_total": "Jobs recovered from malformed extraction output, by method.",
+    "extract_repairs_total": "Repair calls for malformed extraction fragments, by outcome.",
+    "portfolio_skill_lookups_total": "Distinct job skills matched against the portfolio, by path (keyword, vector).",
+    "retrieval_cache_requests_total": "Portfolio link lookups per job skill set, by cache result.",
+    "llm_requests_total": "LLM calls through the scheduler by result (ok, retry, error, coalesced).",
+    "llm_rate_limited_total": "LLM calls rejected with HTTP 429.",
+    "llm_scheduler_wait_seconds": "Time LLM calls waited for the request/token budgets.",
+    "llm_cache_requests_total": "LLM response cache lookups by result.",
+    "page_cache_requests_total": "Page fetches by cache result.",
+    "transcriptions_total": "Audio transcriptions by result (ok, error).",
+    "transcription_duration_seconds": "Time to transcribe an uploaded recording, queueing included.",
+    "transcript_cache_requests_total": "Transcript cache lookups by result.",
+    "import_duration_seconds": "First-import time of lazily loaded modules.",
+}
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = (f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metrics:
+    """Thread-safe registry of counters and histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=DURATION_BUCKETS, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+                self._histograms[key] = histogram
+            index = bisect.bisect_left(histogram["buckets"], value)
+            if index < len(histogram["counts"]):
+                histogram["counts"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def record_stage(self, stage, seconds, error=None, **labels):
+        """Record one stage timing and emit its structured log line."""
+        self.observe("stage_duration_seconds", seconds, stage=stage, **labels)
+        if error is not None:
+            self.inc("stage_errors_total", stage=stage, error=type(error).__name__)
+        logger.info(json.dumps({
+            "event": "stage",
+            "stage": stage,
+            "duration_ms": round(seconds * 1000, 2),
+            "status": "error" if error is not None else "ok",
+            **({"error": type(error).__name__} if error is not None else {}),
+            **labels,
+        }))
+
+    def counted(self, name):
+        """Decorator counting calls of a function by outcome (``status`` label)."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception:
+                    self.inc(name, status="error")
+                    raise
+                self.inc(name, status="ok")
+                return result
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        """Plain-dict view of every series, for the UI debug panel."""
+        with self._lock:
+            counters = [{"metric": name, **dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = [{"metric": name, **dict(labels), "count": h["count"],
+                           "mean": h["sum"] / h["count"] if h["count"] else 0.0}
+                          for (name, labels), h in sorted(self._histograms.items())]
+        return {"counters": counters, "histograms": histograms}
+
+    def render_prometheus(self):
+        """Render every series in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            by_name = {}
+            for (name, labels), value in self._counters.items():
+                by_name.setdefault(name, ("counter", []))[1].append((labels, value))
+            for (name, labels), histogram in self._histograms.items():
+                by_name.setdefault(name, ("histogram", []))[1].append((labels, histogram))
+
+            for name in sorted(by_name):
+                kind, series = by_name[name]
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(series, key=lambda item: item[0]):
+                    if kind == "counter":
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(value["buckets"], value["counts"]):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels, [('le', str(bound))])} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {value['count']}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {value['sum']}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Metrics()
+
+_server = None
+_server_lock = threading.Lock()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=None):
+    """Serve ``/metrics`` on ``port`` (default ``METRICS_PORT``) once per process."""
+    global _server
+    port = port or os.getenv("METRICS_PORT")
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(("0.0.0.0", int(port)), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
+
+
+if os.getenv("METRICS_LOG", "").lower() in ("1", "true", "yes") and not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
@@ -0,0 +1,358 @@
+"""
+Email Generation Pipeline
+
+Runs the fetch -> clean -> prune -> extract_jobs -> dedupe -> query_links -> write_mail stages
+and reports each one as a progress event, so the UI can show where the time
+actually goes instead of a simulated progress bar.
+"""
+
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from dedupe import DEDUPE_THRESHOLD, get_job_registry, plan_dedupe
+from metrics import COUNT_BUCKETS, REGISTRY
+from prune import EXTRACT_TOKEN_BUDGET, prune_for_extraction
+
+
+STAGES = ("fetch", "clean", "prune", "extract_jobs", "dedupe", "query_links", "write_mail")
+
+# Share of the progress bar covered by the page-level stages; the rest is
+# split evenly across the emails once the number of jobs is known.
+STAGE_WEIGHTS = {"fetch": 0.10, "clean": 0.04, "prune": 0.01, "extract_jobs": 0.25, "dedupe": 0.01,
+                 "query_links": 0.05}
+
+STAGE_LABELS = {
+    "fetch": "🔗 Fetching page",
+    "clean": "🧹 Cleaning page text",
+    "prune": "✂️ Trimming page to job content",
+    "extract_jobs": "🧠 Extracting job postings",
+    "dedupe": "🧬 Removing duplicate postings",
+    "query_links": "📁 Matching portfolio links",
+    "write_mail": "✍️ Writing email",
+}
+
+
+@dataclass
+class ProgressEvent:
+    """A single stage transition reported by the pipeline."""
+    stage: str
+    status: str  # "start" or "done"
+    fraction: float
+    message: str
+    job_index: Optional[int] = None
+    job_count: Optional[int] = None
+    elapsed: float = 0.0
+
+
+class _Progress:
+    """Tracks completed stage weight, records stage metrics and forwards events."""
+
+    def __init__(self, callback: Optional[Callable[[ProgressEvent], None]]):
+        self.callback = callback
+        self.completed = 0.0
+        self.job_count = None
+
+    def _job_weight(self):
+        remaining = 1.0 - sum(STAGE_WEIGHTS.values())
+        return remaining / max(self.job_count or 1, 1)
+
+    def _emit(self, stage, status, job_index=None, elapsed=0.0, detail=None):
+        if self.callback is None:
+            return
+        message = STAGE_LABELS[stage]
+        if job_index is not None:
+            message += f" ({job_index + 1}/{self.job_count})"
+        if detail:
+            message += f" — {detail}"
+        self.callback(ProgressEvent(
+            stage=stage,
+            status=status,
+            fraction=min(self.completed, 1.0),
+            message=message,
+            job_index=job_index,
+            job_count=self.job_count,
+            elapsed=elapsed,
+        ))
+
+    def start(self, stage, job_index=None):
+        self._emit(stage, "start", job_index)
+
+    def done(self, stage, elapsed, job_index=None, detail=None):
+        REGISTRY.record_stage(stage, elapsed)
+        if job_index is None:
+            self.completed += STAGE_WEIGHTS.get(stage, 0.0)
+        else:
+            self.completed += self._job_weight()
+        self._emit(stage, "done", job_index, elapsed, detail)
+
+    def skip(self, stage, job_index, detail=None):
+        """Count a job's stage as done without it having run (e.g. a duplicate)."""
+        self.completed += self._job_weight()
+        self._emit(stage, "done", job_index, 0.0, detail)
+
+    def failed(self, stage, elapsed, error):
+        REGISTRY.record_stage(stage, elapsed, error=error)
+
+    def run(self, stage, fn, *args, job_index=None, describe=None):
+        """Run one stage, emitting start/done events around it.
+
+        ``describe(result)`` may return a short note appended to the done message.
+        """
+        self.start(stage, job_index)
+        started = time.perf_counter()
+        try:
+            result = fn(*args)
+        except Exception as e:
+            self.failed(stage, time.perf_counter() - started, e)
+            raise
+        self.done(stage, time.perf_counter() - started, job_index, describe(result) if describe else None)
+        return result
+
+
+def _default_max_distance():
+    value = os.getenv("PORTFOLIO_MAX_DISTANCE", "").strip()
+    return float(value) if value else None
+
+
+def _default_concurrency():
+    return max(int(os.getenv("EMAIL_CONCURRENCY", "4")), 1)
+
+
+@REGISTRY.counted("requests_total")
+def generate_emails(chain, portfolio, url=None, text=None, on_progress=None, max_distance=None,
+                    on_email=None, max_workers=None, on_token=None, use_cache=True, fetcher=None,
+                    token_budget=EXTRACT_TOKEN_BUDGET, registry=None, dedupe_threshold=DEDUPE_THRESHOLD):
+    """Run the full pipeline for a URL or a pasted description.
+
+    Returns a list of ``{"job": ..., "links": ..., "email": ...}`` dicts, one
+    per extracted job, in extraction order. Only distinct jobs get an email
+    written: a duplicate of an earlier job on the page carries
+    ``"duplicate_of": index`` and shares its email, and a job already in the
+    cross-run ``registry`` (default: the shared :class:`dedupe.JobRegistry`)
+    for the same portfolio reuses its stored email and links and carries
+    ``"reused": True``.
+    Emails are written concurrently
+    by up to ``max_workers`` threads (default: ``EMAIL_CONCURRENCY``);
+    ``on_email(index, result)`` is called as each one finishes. When
+    ``on_token(index, text)`` is given, emails are streamed and it receives
+    each new piece of text as soon as the model produces it.
+
+    ``on_progress`` receives a :class:`ProgressEvent` for the start and end of
+    every stage. Links farther than ``max_distance`` (default:
+    ``PORTFOLIO_MAX_DISTANCE``) are not offered to the email writer.
+    ``use_cache=False`` bypasses the LLM response cache and registry lookups
+    for this request.
+    URLs are fetched through ``fetcher`` (default: the shared
+    :class:`fetch.PageFetcher`), which reuses cleaned text for unchanged pages.
+    Pages over ``token_budget`` estimated tokens are trimmed to their most
+    posting-like blocks before extraction (see :mod:`prune`).
+
+    All callbacks run on the calling thread, so they may update Streamlit
+    elements directly.
+    """
+    progress = _Progress(on_progress)
+    if max_distance is None:
+        max_distance = _default_max_distance()
+    if max_workers is None:
+        max_workers = _default_concurrency()
+
+    if url:
+        if fetcher is None:
+            from resources import get_page_fetcher
+            fetcher = get_page_fetcher()
+        page = progress.run("fetch", fetcher.fetch, url)
+        data = progress.run("clean", fetcher.clean, page)
+    else:
+        progress.completed += STAGE_WEIGHTS["fetch"] + STAGE_WEIGHTS["clean"]
+        data = text or "No specific job posting provided"
+
+    pruned = progress.run("prune", prune_for_extraction, data, token_budget,
+                          describe=lambda result: f"saved ~{result.tokens_saved} tokens" if result.tokens_saved else None)
+    REGISTRY.inc("extract_prompt_tokens_total", pruned.kept_tokens)
+    REGISTRY.inc("extract_prompt_tokens_saved_total", pruned.tokens_saved)
+
+    jobs = progress.run("extract_jobs", lambda: chain.extract_jobs(pruned.text, use_cache=use_cache))
+    progress.job_count = len(jobs)
+    REGISTRY.observe("jobs_per_page", len(jobs), buckets=COUNT_BUCKETS)
+
+    if registry is None:
+        registry = get_job_registry()
+    scope = getattr(portfolio, "scope", None) or ""
+    plan = progress.run("dedupe", plan_dedupe, jobs, registry if use_cache else None, dedupe_threshold, scope,
+                        describe=lambda plan: plan.describe())
+
+    results = [None] * len(jobs)
+    for index, previous in plan.reused.items():
+        results[index] = {"job": jobs[index], "links": previous["links"], "email": previous["email"],
+                          "reused": True}
+        progress.skip("write_mail", index, "written before")
+        if on_email is not None:
+            on_email(index, results[index])
+
+    # One batched vector query for every distinct job on the page
+    skills_per_job = [jobs[index].get('skills', []) for index in plan.unique]
+    links_per_job = progress.run("query_links", lambda: portfolio.query_links_batch(
+        skills_per_job, max_distance=max_distance))
+
+    def on_written(position, result):
+        index = plan.unique[position]
+        results[index] = result
+        if registry is not None:
+            registry.record(plan.keys[index], result["job"], result["links"], result["email"], source=url,
+                            scope=scope)
+        if on_email is not None:
+            on_email(index, result)
+        for duplicate, original in plan.duplicate_of.items():
+            if original == index:
+                fill_duplicate(duplicate, original)
+
+    def fill_duplicate(duplicate, original):
+        results[duplicate] = {**results[original], "job": jobs[duplicate], "duplicate_of": original}
+        progress.skip("write_mail", duplicate, f"same posting as #{original + 1}")
+        if on_email is not None:
+            on_email(duplicate, results[duplicate])
+
+    for duplicate, original in plan.duplicate_of.items():
+        if original in plan.reused:
+            fill_duplicate(duplicate, original)
+
+    stream = None if on_token is None else (lambda position, text: on_token(plan.unique[position], text))
+    _write_emails(chain, [jobs[index] for index in plan.unique], links_per_job, progress, max_workers,
+                  on_written, stream, use_cache, job_indices=plan.unique)
+    return results
+
+
+def _write_emails(chain, jobs, links_per_job, progress, max_workers, on_email, on_token, use_cache,
+                  job_indices=None):
+    """Fan write_mail out over a thread pool and report back on this thread.
+
+    Workers only push ``(kind, index, payload)`` tuples onto a queue; the
+    calling thread drains it, so every callback runs where it was registered.
+    ``job_indices`` maps positions in ``jobs`` to the indices shown in
+    progress events, when only some of a page's jobs are being written.
+    """
+    if job_indices is None:
+        job_indices = range(len(jobs))
+    results = [None] * len(jobs)
+    if not jobs:
+        return results
+
+    events = queue.Queue()
+
+    def write(index, job, links):
+        started = time.perf_counter()
+        try:
+            if on_token is None:
+                email = chain.write_mail(job, links, use_cache=use_cache)
+            else:
+                parts = []
+                for token in chain.stream_mail(job, links, use_cache=use_cache):
+                    parts.append(token)
+                    events.put(("token", index, token))
+                email = "".join(parts)
+            events.put(("done", index, (email, time.perf_counter() - started)))
+        except BaseException as e:
+            events.put(("error", index, (e, time.perf_counter() - started)))
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+        futures = []
+        for index, (job, links) in enumerate(zip(jobs, links_per_job)):
+            progress.start("write_mail", job_indices[index])
+            futures.append(executor.submit(write, index, job, links))
+
+        try:
+            remaining = len(jobs)
+            while remaining:
+                batch = [events.get()]
+                # Coalesce tokens that arrived meanwhile into one UI update per job
+                while True:
+                    try:
+                        batch.append(events.get_nowait())
+                    except queue.Empty:
+                        break
+                pending_tokens = {}
+                for kind, index, payload in batch:
+                    if kind == "token":
+                        pending_tokens[index] = pending_tokens.get(index, "") + payload
+                        continue
+                    if index in pending_tokens:
+                        on_token(index, pending_tokens.pop(index))
+                    if kind == "error":
+                        error, elapsed = payload
+                        progress.failed("write_mail", elapsed, error)
+                        raise error
+                    email, elapsed = payload
+                    results[index] = {"job": jobs[index], "links": links_per_job[index], "email": email}
+                    remaining -= 1
+                    REGISTRY.inc("emails_total")
+                    progress.done("write_mail", elapsed, job_indices[index])
+                    if on_email is not None:
+                        on_email(index, results[index])
+                for index, tokens in pending_tokens.items():
+                    on_token(index, tokens)
+        except BaseException:
+            # Don't keep paying for emails of a request that already failed
+            for future in futures:
+                future.cancel()
+            raise
+
+    return results
+
+
+def _default_url_concurrency():
+    return max(int(os.getenv("URL_CONCURRENCY", "4")), 1)
+
+
+def generate_emails_for_urls(chain, portfolio, urls, on_progress=None, on_email=None, on_token=None,
+                             on_error=None, max_urls=None, **options):
+    """Run :func:`generate_emails` for several URLs concurrently.
+
+    Up to ``max_urls`` pages (default: ``URL_CONCURRENCY``) are processed at
+    once. Callbacks take the URL's index as their first argument and, as in
+    :func:`generate_emails`, run on the calling thread. A failing URL is
+    reported through ``on_error(url_index, exception)`` without stopping the
+    others. Returns one entry per URL: its results list, or the exception.
+    """
+    if max_urls is None:
+        max_urls = _default_url_concurrency()
+    outcomes = [None] * len(urls)
+    if not urls:
+        return outcomes
+
+    events = queue.Queue()
+
+    def run(url_index, url):
+        def put(kind):
+            return lambda *payload: events.put((kind, url_index, payload))
+        try:
+            results = generate_emails(
+                chain, portfolio, url=url,
+                on_progress=put("progress") if on_progress else None,
+                on_email=put("email") if on_email else None,
+                on_token=put("token") if on_token else None,
+                **options,
+            )
+            events.put(("done", url_index, (results,)))
+        except Exception as e:
+            events.put(("error", url_index, (e,)))
+
+    handlers = {"progress": on_progress, "email": on_email, "token": on_token, "error": on_error}
+    with ThreadPoolExecutor(max_workers=min(max_urls, len(urls))) as executor:
+        for url_index, url in enumerate(urls):
+            executor.submit(run, url_index, url)
+
+        remaining = len(urls)
+        while remaining:
+            kind, url_index, payload = events.get()
+            if kind in ("done", "error"):
+                outcomes[url_index] = payload[0]
+                remaining -= 1
+            handler = handlers.get(kind)
+            if handler is not None:
+                handler(url_index, *payload)
+
+    return outcomes
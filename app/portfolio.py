@@ -1,21 +1,146 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
 import pandas as pd
-import chromadb
-import uuid
+
+from keyword_index import KeywordIndex, SkillMap, fuse_rankings, load_skill_aliases
+from metrics import REGISTRY
+from snapshot import default_portfolio_path
+from vector_index import ChromaIndex, open_index
+
+PORTFOLIO_KEYWORD_SEARCH = os.getenv("PORTFOLIO_KEYWORD_SEARCH", "1").lower() not in ("0", "false", "no")
+# Ranked links kept per portfolio, keyed by normalized skill set; 0 disables the cache
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024"))
+
+
+def row_id(techstack, links):
+    """Stable id for a portfolio row, derived from its content."""
+    return hashlib.sha1(f"{techstack}\x1f{links}".encode("utf-8")).hexdigest()
+
+
+def portfolio_rows(data):
+    """Map row id to ``(techstack, links)`` for every complete row of a portfolio DataFrame."""
+    rows = {}
+    for techstack, links in data[["Techstack", "Links"]].dropna().itertuples(index=False):
+        rows[row_id(techstack, links)] = (str(techstack), str(links))
+    return rows
 
 
 class Portfolio:
-    def __init__(self, file_path="resource/my_portfolio.csv"):
-        self.file_path = file_path
-        self.data = pd.read_csv(file_path)
-        self.chroma_client = chromadb.PersistentClient('vectorstore')
-        self.collection = self.chroma_client.get_or_create_collection(name="portfolio")
+    def __init__(self, file_path=None, chroma_client=None, embedding_function=None,
+                 index=None, scope=None):
+        self.file_path = file_path or default_portfolio_path()
+        # Identifies this portfolio's content (and tenant) to caches keyed on its links
+        self.scope = scope
+        self.data = pd.read_csv(self.file_path)
+        rows = portfolio_rows(self.data)
+        self.skills = SkillMap(rows, load_skill_aliases())
+        self.keywords = KeywordIndex(rows) if PORTFOLIO_KEYWORD_SEARCH else None
+        # Lives and dies with this Portfolio, so a changed CSV (a new Portfolio) starts empty
+        self._results = OrderedDict()
+        self._results_lock = threading.Lock()
+        if index is None:
+            if chroma_client is not None:
+                index = ChromaIndex(chroma_client, embedding_function=embedding_function)
+            else:
+                index = open_index(embedding_function=embedding_function)
+        self.index = index
 
     def load_portfolio(self):
-        if not self.collection.count():
-            for _, row in self.data.iterrows():
-                self.collection.add(documents=row["Techstack"],
-                                    metadatas={"links": row["Links"]},
-                                    ids=[str(uuid.uuid4())])
-
-    def query_links(self, skills):
-        return self.collection.query(query_texts=skills, n_results=2).get('metadatas', [])
+        """Sync the index with the CSV, embedding only new or changed rows.
+
+        Row ids are content hashes, so unchanged rows are skipped, edited rows
+        show up as one delete plus one add, and removed rows are deleted.
+        """
+        rows = portfolio_rows(self.data)
+        existing = set(self.index.ids())
+        stale = [id_ for id_ in existing if id_ not in rows]
+        missing = [id_ for id_ in rows if id_ not in existing]
+
+        self.index.delete(stale)
+        if missing:
+            self.index.add(missing,
+                           documents=[rows[id_][0] for id_ in missing],
+                           metadatas=[{"links": rows[id_][1]} for id_ in missing])
+        if stale or missing:
+            with self._results_lock:
+                self._results.clear()
+        return {"added": len(missing), "deleted": len(stale), "unchanged": len(rows) - len(missing)}
+
+    def query_links(self, skills, n_results=2, max_distance=None):
+        return self.query_links_batch([skills], n_results=n_results, max_distance=max_distance)[0]
+
+    def query_links_batch(self, skills_per_job, n_results=2, max_distance=None):
+        """Return ranked, deduplicated portfolio links for several jobs at once.
+
+        Skills are first rewritten to their canonical names, and a job whose
+        skill set was ranked before (by any session) is answered from the
+        result cache. For the rest, skills the keyword index matches are
+        answered from it without an embedding call; the remaining distinct
+        skills are embedded once and sent in a single vector query, dropping
+        links farther than ``max_distance``. Each job's per-skill rankings
+        are merged with reciprocal rank fusion.
+        """
+        skill_sets = [self.skills.normalize_all(_as_skill_list(skills)) for skills in skills_per_job]
+        results = {}
+        for skills in dict.fromkeys(skill_sets):
+            cached = self._cached_result((skills, n_results, max_distance))
+            if cached is not None:
+                results[skills] = cached
+        misses = [skills for skills in dict.fromkeys(skill_sets) if skills not in results]
+        REGISTRY.inc("retrieval_cache_requests_total", len(skill_sets) - len(misses), result="hit")
+        REGISTRY.inc("retrieval_cache_requests_total", len(misses), result="miss")
+
+        if misses:
+            matches = self._match_skills(list(dict.fromkeys(skill for skills in misses for skill in skills)),
+                                         n_results, max_distance)
+            for skills in misses:
+                results[skills] = fuse_rankings([matches[skill] for skill in skills if skill in matches])
+                self._store_result((skills, n_results, max_distance), results[skills])
+        return [list(results[skills]) for skills in skill_sets]
+
+    def _match_skills(self, distinct, n_results, max_distance):
+        """Ranked links per skill, from the keyword index where it matches and the vector index otherwise."""
+        matches = {}
+        if self.keywords is not None:
+            for skill in distinct:
+                links = self.keywords.search(skill, n_results)
+                if links:
+                    matches[skill] = links
+        unmatched = [skill for skill in distinct if skill not in matches]
+        REGISTRY.inc("portfolio_skill_lookups_total", len(matches), path="keyword")
+        REGISTRY.inc("portfolio_skill_lookups_total", len(unmatched), path="vector")
+
+        count = self.index.count() if unmatched else 0
+        if count:
+            all_metadatas, all_distances = self.index.query(unmatched, n_results=min(n_results, count))
+            for skill, metadatas, distances in zip(unmatched, all_metadatas, all_distances):
+                matches[skill] = [metadata["links"] for metadata, distance in zip(metadatas, distances)
+                                  if max_distance is None or distance <= max_distance]
+        return matches
+
+    def _cached_result(self, key):
+        with self._results_lock:
+            links = self._results.get(key)
+            if links is not None:
+                self._results.move_to_end(key)
+            return links
+
+    def _store_result(self, key, links):
+        if RETRIEVAL_CACHE_SIZE <= 0:
+            return
+        with self._results_lock:
+            self._results[key] = tuple(links)
+            self._results.move_to_end(key)
+            while len(self._results) > RETRIEVAL_CACHE_SIZE:
+                self._results.popitem(last=False)
+
+def _as_skill_list(skills):
+    """Normalize the ``skills`` value of an extracted job to a list of strings."""
+    if not skills:
+        return []
+    if isinstance(skills, str):
+        skills = skills.split(",")
+    return [str(skill).strip() for skill in skills if str(skill).strip()]
@@ -0,0 +1,109 @@
+"""
+Pre-extraction Page Pruning
+
+Careers pages carry navigation, cookie banners, footers and teaser text
+that cost prompt tokens without containing postings. When a cleaned page
+is over the token budget, its blocks (lines) are scored by how much they
+look like job-posting content and the boilerplate is dropped first.
+"""
+
+import math
+import os
+import re
+from dataclasses import dataclass
+
+from utils import estimate_tokens
+
+EXTRACT_TOKEN_BUDGET = int(os.getenv("EXTRACT_TOKEN_BUDGET", "8000"))
+
+POSTING_TERMS = {
+    "responsibilities": 3, "requirements": 3, "qualifications": 3, "experience": 2, "years": 2,
+    "skills": 2, "apply": 1, "salary": 2, "compensation": 2, "full-time": 2, "part-time": 2,
+    "contract": 1, "remote": 1, "hybrid": 1, "onsite": 1, "location": 1, "role": 2, "position": 2,
+    "engineer": 2, "developer": 2, "manager": 1, "analyst": 2, "designer": 2, "scientist": 2,
+    "senior": 1, "junior": 1, "lead": 1, "intern": 1, "job": 1, "team": 1, "degree": 2,
+    "knowledge": 1, "proficiency": 2, "familiarity": 2, "hands-on": 2, "you": 1, "we're": 1,
+    "looking": 1, "benefits": 1, "id": 1,
+}
+BOILERPLATE_TERMS = {
+    "cookie": 4, "cookies": 4, "privacy": 3, "terms": 2, "copyright": 4, "rights": 3, "reserved": 3,
+    "subscribe": 3, "newsletter": 3, "sign": 1, "login": 2, "log": 1, "follow": 2, "facebook": 3,
+    "twitter": 3, "linkedin": 2, "instagram": 3, "youtube": 3, "accept": 2, "consent": 3,
+    "menu": 2, "home": 1, "sitemap": 3, "javascript": 2, "browser": 2,
+}
+# Tokens that look like technologies: C++, C#, Node.js, CI/CD, or CamelCase names
+_TECH_TOKEN = re.compile(r"\w+(?:\+\+|#|\.js|/\w+)|\b[A-Z][a-z]+[A-Z]\w*")
+_WORD = re.compile(r"[\w'+#.-]+")
+
+
+@dataclass
+class PruneResult:
+    text: str
+    original_tokens: int
+    kept_tokens: int
+    blocks_total: int
+    blocks_kept: int
+
+    @property
+    def tokens_saved(self):
+        return self.original_tokens - self.kept_tokens
+
+
+def split_blocks(text, max_block_tokens=200):
+    """Split cleaned text into lines, breaking overlong lines at sentences."""
+    blocks = []
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        if estimate_tokens(line) <= max_block_tokens:
+            blocks.append(line)
+        else:
+            blocks.extend(part for part in re.split(r"(?<=[.!?])\s+", line) if part)
+    return blocks
+
+
+def score_block(block):
+    """Posting-likeness of one block; negative for boilerplate."""
+    words = [word.lower().strip(".,") for word in _WORD.findall(block)]
+    if not words:
+        return -1.0
+    positive = sum(POSTING_TERMS.get(word, 0) for word in words) + len(_TECH_TOKEN.findall(block))
+    negative = sum(BOILERPLATE_TERMS.get(word, 0) for word in words)
+    score = (positive - 2 * negative) / math.sqrt(len(words))
+    if len(words) <= 3 and positive == 0:
+        # Bare navigation items and buttons
+        score -= 1.0
+    return score
+
+
+def prune_for_extraction(text, token_budget=EXTRACT_TOKEN_BUDGET):
+    """Cut ``text`` down to ``token_budget`` estimated tokens, keeping posting-like blocks.
+
+    Blocks are dropped lowest-score first, boilerplate (negative score)
+    before anything else, until the page fits. Survivors keep their page
+    order, and no block is dropped while a lower-scoring one is still kept.
+    """
+    original_tokens = estimate_tokens(text)
+    if original_tokens <= token_budget:
+        return PruneResult(text, original_tokens, original_tokens, 0, 0)
+
+    blocks = split_blocks(text)
+    raw = [score_block(block) for block in blocks]
+    # Blend in neighbours so headings and short lines inside a posting stay with it
+    scores = [
+        raw[i] + 0.5 * (sum(raw[j] for j in (i - 1, i + 1) if 0 <= j < len(raw)) / 2)
+        for i in range(len(raw))
+    ]
+    costs = [estimate_tokens(block) for block in blocks]
+
+    keep = set(range(len(blocks)))
+    used = sum(costs)
+    for i in sorted(range(len(blocks)), key=lambda i: scores[i]):
+        if used <= token_budget:
+            break
+        keep.discard(i)
+        used -= costs[i]
+
+    pruned = "\n".join(block for i, block in enumerate(blocks) if i in keep)
+    return PruneResult(pruned, original_tokens, estimate_tokens(pruned), len(blocks), len(keep))
@@ -0,0 +1,200 @@
+"""
+Shared Pipeline Resources
+
+One ``Chain``, Chroma client and embedding model per process, shared by
+every Streamlit session, plus a bounded LRU of open portfolios (the default one and any
+tenant uploads). Each resource is rebuilt only when its inputs change: the
+chain when the Groq API key changes, a portfolio when its CSV changes on
+disk. The modules behind them are only imported on first use. Tenants past
+their retention period are closed and deleted by :func:`cleanup_tenants`.
+
+Paths resolve to absolute locations (see snapshot.py), so every entry
+point shares the same portfolio CSV and index snapshot.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from lazy import lazy_import
+from snapshot import default_portfolio_path, index_root, open_snapshot
+
+DEFAULT_PORTFOLIO_PATH = default_portfolio_path()
+# Open portfolios kept in memory, across the default one and all tenants
+PORTFOLIO_CACHE_SIZE = max(int(os.getenv("PORTFOLIO_CACHE_SIZE", "8")), 1)
+TENANT_CLEANUP_INTERVAL = int(os.getenv("TENANT_CLEANUP_INTERVAL", "3600"))
+
+_lock = threading.RLock()
+_chain = None
+_chain_key = None
+_portfolios = OrderedDict()  # (tenant, csv path, backend) -> (file signature, portfolio, manifest)
+_portfolio_locks = {}
+_chroma_clients = {}
+_embedding_function = None
+_page_fetcher = None
+_last_tenant_cleanup = 0.0
+
+
+def _current_api_key():
+    return os.getenv("GROQ_API_KEY", "").strip()
+
+
+def _file_signature(file_path):
+    """Identify a file version by absolute path, mtime and size."""
+    path = os.path.abspath(file_path)
+    stat = os.stat(path)
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+def get_chroma_client(persist_directory=None):
+    """Return the process-wide Chroma client for a persist directory."""
+    chromadb = lazy_import("chromadb")
+
+    persist_directory = persist_directory or index_root()
+    path = os.path.abspath(persist_directory)
+    with _lock:
+        client = _chroma_clients.get(path)
+        if client is None:
+            client = chromadb.PersistentClient(path)
+            _chroma_clients[path] = client
+        return client
+
+
+def get_embedding_function():
+    """Return the process-wide embedding function, so every open portfolio shares one model."""
+    global _embedding_function
+    default_embedding_function = lazy_import("vector_index").default_embedding_function
+
+    with _lock:
+        if _embedding_function is None:
+            _embedding_function = default_embedding_function()
+        return _embedding_function
+
+
+def get_portfolio_index(backend=None, persist_directory=None):
+    """Open the portfolio index for ``PORTFOLIO_INDEX_BACKEND``, sharing the Chroma client and embedding model."""
+    vector_index = lazy_import("vector_index")
+
+    backend = (backend or vector_index.PORTFOLIO_INDEX_BACKEND).lower()
+    if backend == "chroma":
+        return vector_index.ChromaIndex(get_chroma_client(persist_directory),
+                                        embedding_function=get_embedding_function())
+    return vector_index.open_index(backend, persist_directory, embedding_function=get_embedding_function())
+
+
+def get_page_fetcher():
+    """Return the process-wide PageFetcher and its page cache."""
+    global _page_fetcher
+    PageFetcher = lazy_import("fetch").PageFetcher
+
+    with _lock:
+        if _page_fetcher is None:
+            _page_fetcher = PageFetcher()
+        return _page_fetcher
+
+
+def get_chain(api_key=None):
+    """Return the shared Chain, rebuilding it if the API key has changed."""
+    global _chain, _chain_key
+    Chain = lazy_import("chains").Chain
+
+    api_key = api_key or _current_api_key()
+    with _lock:
+        if _chain is None or _chain_key != api_key:
+            _chain = Chain(api_key=api_key)
+            _chain_key = api_key
+        return _chain
+
+
+def _cached_portfolio(key, signature):
+    with _lock:
+        entry = _portfolios.get(key)
+        if entry is None or entry[0] != signature:
+            return None
+        _portfolios.move_to_end(key)
+        return entry[1], entry[2]
+
+
+def _evict_portfolios():
+    while len(_portfolios) > PORTFOLIO_CACHE_SIZE:
+        _drop_portfolio(next(iter(_portfolios)))
+
+
+def _drop_portfolio(key):
+    _, portfolio, _ = _portfolios.pop(key)
+    lock = _portfolio_locks.get(key)
+    if lock is not None and not lock.locked():
+        del _portfolio_locks[key]
+    client = getattr(portfolio.index, "client", None)
+    for path, open_client in list(_chroma_clients.items()):
+        if open_client is client:
+            del _chroma_clients[path]
+
+
+def get_portfolio_snapshot(file_path=DEFAULT_PORTFOLIO_PATH, tenant=None):
+    """Return the shared ``(portfolio, manifest)``, switching snapshots if the CSV changed.
+
+    Portfolios are opened lazily and kept in an LRU of ``PORTFOLIO_CACHE_SIZE``.
+    Each one is built under its own lock, so a tenant embedding a new upload
+    doesn't hold up sessions using other portfolios.
+    """
+    backend = lazy_import("vector_index").PORTFOLIO_INDEX_BACKEND
+    key = (tenant, os.path.abspath(file_path), backend)
+    signature = _file_signature(file_path)
+
+    cached = _cached_portfolio(key, signature)
+    if cached is not None:
+        return cached
+    with _lock:
+        build_lock = _portfolio_locks.setdefault(key, threading.Lock())
+    with build_lock:
+        # Another session may have opened it while we waited
+        cached = _cached_portfolio(key, signature)
+        if cached is not None:
+            return cached
+        portfolio, manifest = open_snapshot(file_path, get_portfolio_index, backend, tenant)
+        with _lock:
+            _portfolios[key] = (signature, portfolio, manifest)
+            _portfolios.move_to_end(key)
+            _evict_portfolios()
+        return portfolio, manifest
+
+
+def get_portfolio(file_path=DEFAULT_PORTFOLIO_PATH, tenant=None):
+    """Return the shared, loaded Portfolio, reloading it if the CSV changed."""
+    return get_portfolio_snapshot(file_path, tenant)[0]
+
+
+def cleanup_tenants():
+    """Close and delete the portfolios of tenants unused for their retention period."""
+    tenants = lazy_import("tenants")
+
+    removed = tenants.expired_tenants()
+    for tenant in removed:
+        with _lock:
+            for key in [key for key in _portfolios if key[0] == tenant]:
+                _drop_portfolio(key)
+        tenants.remove_tenant(tenant)
+    return removed
+
+
+def cleanup_tenants_in_background():
+    """Run :func:`cleanup_tenants` on a daemon thread, at most every ``TENANT_CLEANUP_INTERVAL`` seconds."""
+    global _last_tenant_cleanup
+    with _lock:
+        if time.time() - _last_tenant_cleanup < TENANT_CLEANUP_INTERVAL:
+            return
+        _last_tenant_cleanup = time.time()
+    threading.Thread(target=cleanup_tenants, name="tenant-cleanup", daemon=True).start()
+
+
+def invalidate(chain=True, portfolio=True):
+    """Drop cached resources so the next getter call rebuilds them."""
+    global _chain, _chain_key
+    with _lock:
+        if chain:
+            _chain = None
+            _chain_key = None
+        if portfolio:
+            _portfolios.clear()
@@ -0,0 +1,295 @@
+"""
+Rate-limited LLM Request Scheduler
+
+Every Groq call made by ``Chain`` goes through one process-wide scheduler:
+
+- Token buckets hold requests-per-minute (``GROQ_RPM``) and tokens-per-minute
+  (``GROQ_TPM``) budgets shared by all sessions, so bursts queue here
+  instead of turning into 429s. Set either to 0 to disable it.
+- Rate-limit, timeout, connection and 5xx errors are retried up to
+  ``LLM_MAX_RETRIES`` times with full-jitter exponential backoff, honouring
+  ``Retry-After`` and pausing every caller while the API asks us to.
+- Identical prompts already in flight are coalesced: concurrent duplicates
+  wait for the one upstream call and share its text, whether each caller
+  used ``invoke`` or ``stream``. If the leading stream's reader goes away,
+  a waiting caller takes over and makes the call itself.
+"""
+
+import email.utils
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import REGISTRY
+from utils import estimate_tokens
+
+GROQ_RPM = float(os.getenv("GROQ_RPM", "30"))
+GROQ_TPM = float(os.getenv("GROQ_TPM", "6000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+# Completion tokens charged up front, before the response reports real usage
+EXPECTED_COMPLETION_TOKENS = int(os.getenv("EXPECTED_COMPLETION_TOKENS", "400"))
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class RateLimitedError(RuntimeError):
+    """The LLM API kept rejecting a request after every retry."""
+
+
+class _StreamAbandoned(RuntimeError):
+    """The caller leading a coalesced stream stopped reading it."""
+
+
+class TokenBucket:
+    """Refills ``rate_per_minute`` units per minute, holding at most one minute's worth."""
+
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount):
+        """Take ``amount`` units now; return how long to wait before they are really available."""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level -= amount
+            return max(-self.level / self.rate, 0.0)
+
+    def adjust(self, amount):
+        """Charge (positive) or refund (negative) units after the fact."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level = min(self.capacity, self.level - amount)
+
+
+def _status_code(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def _retry_after(error):
+    """Seconds the server asked us to wait, from ``Retry-After`` (seconds or HTTP date)."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error):
+    if _status_code(error) in RETRYABLE_STATUS:
+        return True
+    try:
+        import groq
+    except ImportError:
+        return False
+    # Covers timeouts, which subclass it
+    return isinstance(error, groq.APIConnectionError)
+
+
+class RequestScheduler:
+    """Shared request/token budgets, retries and single-flight for LLM calls."""
+
+    def __init__(self, requests_per_minute=GROQ_RPM, tokens_per_minute=GROQ_TPM, max_retries=LLM_MAX_RETRIES,
+                 backoff_base=LLM_BACKOFF_BASE, backoff_max=LLM_BACKOFF_MAX):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._paused_until = 0.0
+
+    def _admit(self, tokens):
+        """Block until the budgets (and any server-requested pause) allow one more call."""
+        waits = [self._paused_until - time.monotonic()]
+        if self.requests is not None:
+            waits.append(self.requests.reserve(1))
+        if self.tokens is not None:
+            waits.append(self.tokens.reserve(tokens))
+        wait = max(waits)
+        if wait > 0:
+            REGISTRY.observe("llm_scheduler_wait_seconds", wait)
+            time.sleep(wait)
+
+    def _backoff(self, attempt, error):
+        retry_after = _retry_after(error)
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if retry_after is not None:
+            delay += retry_after
+            with self._lock:
+                # Everyone waits: the limit is per API key, not per caller
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        return delay
+
+    def _call(self, fn, tokens):
+        attempt = 0
+        while True:
+            self._admit(tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_retryable(e):
+                    REGISTRY.inc("llm_requests_total", result="error")
+                    raise
+                if _status_code(e) == 429:
+                    REGISTRY.inc("llm_rate_limited_total")
+                if attempt >= self.max_retries:
+                    REGISTRY.inc("llm_requests_total", result="error")
+                    if _status_code(e) == 429:
+                        raise RateLimitedError(
+                            "The Groq API rate limit was reached. Please try again in a minute."
+                        ) from e
+                    raise
+                REGISTRY.inc("llm_requests_total", result="retry")
+                time.sleep(self._backoff(attempt, e))
+                attempt += 1
+                continue
+            REGISTRY.inc("llm_requests_total", result="ok")
+            return result
+
+    def _join_or_lead(self, key):
+        """Return ``(future, leader)``; the leader must resolve the future."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            return future, True
+
+    def _await_or_lead(self, key):
+        """Return ``(None, text)`` from an identical in-flight call, or ``(future, None)`` to lead one."""
+        while True:
+            future, leader = self._join_or_lead(key)
+            if leader:
+                return future, None
+            try:
+                text = future.result()
+            except _StreamAbandoned:
+                continue  # nobody will finish that call; take over or follow whoever did
+            REGISTRY.inc("llm_requests_total", result="coalesced")
+            return None, text
+
+    def _finish(self, key, future, result=None, error=None):
+        with self._lock:
+            self._in_flight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _charge(self, prompt):
+        return estimate_tokens(prompt) + EXPECTED_COMPLETION_TOKENS
+
+    def _reconcile(self, charged, message):
+        usage = getattr(message, "usage_metadata", None) or {}
+        if self.tokens is not None and usage.get("total_tokens"):
+            self.tokens.adjust(usage["total_tokens"] - charged)
+
+    def invoke(self, llm, prompt, key=None):
+        """``llm.invoke(prompt)`` within the budgets; callers sharing ``key`` share one call.
+
+        A caller that joins an in-flight call gets an ``AIMessage`` with its text.
+        """
+        charged = self._charge(prompt)
+        if key is None:
+            message = self._call(lambda: llm.invoke(prompt), charged)
+            self._reconcile(charged, message)
+            return message
+
+        future, text = self._await_or_lead(key)
+        if future is None:
+            from langchain_core.messages import AIMessage
+
+            # The leader may be streaming, so followers share the text, not the message
+            return AIMessage(content=text)
+        try:
+            message = self._call(lambda: llm.invoke(prompt), charged)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._reconcile(charged, message)
+        self._finish(key, future, result=message.content)
+        return message
+
+    def stream(self, llm, prompt, key=None):
+        """Yield text chunks of ``llm.stream(prompt)`` within the budgets.
+
+        Failures before the first chunk are retried. A caller joining an
+        identical in-flight stream waits for it and receives the whole text
+        at once.
+        """
+        future, text = self._await_or_lead(key) if key is not None else (None, None)
+        if text is not None:
+            yield text
+            return
+
+        charged = self._charge(prompt)
+        parts = []
+        usage = None
+        try:
+            chunks = self._call(lambda: _first_chunk(llm.stream(prompt)), charged)
+            for chunk in chunks:
+                if getattr(chunk, "usage_metadata", None):
+                    usage = chunk  # the last chunk reports the whole call's usage
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+        except BaseException as e:
+            if future is not None:
+                # A consumer that stopped reading (GeneratorExit) hands the call over to a waiting caller
+                self._finish(key, future, error=e if isinstance(e, Exception) else _StreamAbandoned())
+            raise
+        self._reconcile(charged, usage)
+        if future is not None:
+            self._finish(key, future, result="".join(parts))
+
+
+def _first_chunk(iterator):
+    """Start a stream inside the retry loop: pull the first chunk, then hand back the rest."""
+    iterator = iter(iterator)
+    try:
+        first = next(iterator)
+    except StopIteration:
+        return iter(())
+    return _chain_first(first, iterator)
+
+
+def _chain_first(first, rest):
+    yield first
+    yield from rest
+
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Process-wide scheduler shared by every Chain."""
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = RequestScheduler()
+        return _default_scheduler
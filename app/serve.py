@@ -0,0 +1,44 @@
+"""
+Server Launcher with In-process Warm-up
+
+Starts the portfolio warm-up (snapshot, embedding model, LLM stack; see
+snapshot.py) and then runs Streamlit in the same process, so the sessions
+it serves find everything already loaded. The port is only bound once the
+warm-up finishes, so a port-based health check can't report ready before
+then. Waiting is capped at ``WARMUP_TIMEOUT`` seconds (platforms kill
+slow-booting web processes); past that the server starts anyway and the
+warm-up keeps running in the background.
+
+Usage:
+    python app/serve.py streamlit_app.py --server.port 8501 --server.headless true
+"""
+
+import os
+import sys
+import time
+
+from snapshot import warm_up_in_background
+
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "30"))
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv:
+        print("usage: python app/serve.py <script.py> [streamlit options]", file=sys.stderr)
+        return 2
+
+    started = time.perf_counter()
+    warm_thread = warm_up_in_background()
+    warm_thread.join(WARMUP_TIMEOUT)
+    state = "still running" if warm_thread.is_alive() else "done"
+    print(f"Warm-up {state} after {time.perf_counter() - started:.1f}s; starting Streamlit", file=sys.stderr)
+
+    from streamlit.web import cli
+
+    sys.argv = ["streamlit", "run", *argv]
+    return cli.main()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""
+Portfolio Index Snapshots and Warm-up
+
+The portfolio index lives in a snapshot directory named after the index
+format version, the backend and a hash of the portfolio rows, under one
+absolute index root (``CHROMA_PERSIST_DIRECTORY``; relative values resolve
+against the repository root, whichever entry point started the app):
+
+    <index root>/numpy-v1-3f9c2a0d41b7e5c8/
+    <index root>/tenants/<tenant>/numpy-v1-.../   (tenant portfolios)
+
+A ``manifest.json`` written last marks a snapshot complete. Opening the
+snapshot that matches the current CSV embeds nothing; an edited CSV gets a
+new snapshot seeded from the previous one, so only changed rows are
+embedded.
+
+Usage:
+    python app/snapshot.py build   # in the build phase (Docker build, Heroku
+                                   # bin/post_compile, Railway buildCommand)
+    python app/snapshot.py warm    # load everything once, e.g. to time it
+
+The server itself is started through ``app/serve.py``, which runs the
+warm-up inside the Streamlit process before binding the port. With plain
+``streamlit run``, set ``WARMUP_ON_START=1`` to warm up in the background
+when the first session connects instead.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(APP_DIR)
+SNAPSHOT_VERSION = 1
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "3"))
+MANIFEST = "manifest.json"
+
+_warm_lock = threading.Lock()
+_warm_thread = None
+
+
+def resolve_path(path):
+    """Absolute path, with relative paths taken from the repository root."""
+    return os.path.abspath(os.path.join(ROOT_DIR, os.path.expanduser(path)))
+
+
+def index_root():
+    return resolve_path(os.getenv("CHROMA_PERSIST_DIRECTORY", os.path.join("app", "vectorstore")))
+
+
+def default_portfolio_path():
+    return resolve_path(os.getenv("PORTFOLIO_CSV", os.path.join("app", "resource", "my_portfolio.csv")))
+
+
+def rows_digest(row_ids):
+    """Hash of a portfolio's content-hash row ids, independent of row order."""
+    return hashlib.sha256("\n".join(sorted(row_ids)).encode("utf-8")).hexdigest()
+
+
+def tenant_snapshot_root():
+    return os.path.join(index_root(), "tenants")
+
+
+def _base_dir(tenant=None):
+    return index_root() if tenant is None else os.path.join(tenant_snapshot_root(), tenant)
+
+
+def snapshot_dir(backend, digest, tenant=None):
+    return os.path.join(_base_dir(tenant), f"{backend}-v{SNAPSHOT_VERSION}-{digest[:16]}")
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("version") == SNAPSHOT_VERSION else None
+
+
+def _write_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _snapshots(backend, tenant=None):
+    """Complete snapshots of ``backend`` at the current version, newest first."""
+    root = _base_dir(tenant)
+    prefix = f"{backend}-v{SNAPSHOT_VERSION}-"
+    if not os.path.isdir(root):
+        return []
+    found = [os.path.join(root, name) for name in os.listdir(root) if name.startswith(prefix)]
+    found = [path for path in found if read_manifest(path) is not None]
+    return sorted(found, key=lambda path: read_manifest(path)["built_at"], reverse=True)
+
+
+def _prune(backend, current, tenant=None):
+    for path in _snapshots(backend, tenant)[SNAPSHOT_KEEP:]:
+        if path != current:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def open_snapshot(file_path, open_index, backend, tenant=None):
+    """Return ``(portfolio, manifest)`` for the snapshot matching ``file_path``.
+
+    ``open_index(backend, directory)`` opens the index stored in a snapshot
+    directory. Missing snapshots are built before returning. Snapshots of
+    different tenants never share a directory, even for identical CSVs.
+    """
+    from lazy import lazy_import
+
+    pd = lazy_import("pandas")
+    portfolio_module = lazy_import("portfolio")
+
+    digest = rows_digest(portfolio_module.portfolio_rows(pd.read_csv(file_path)))
+    directory = snapshot_dir(backend, digest, tenant)
+    scope = f"{tenant or ''}:{digest}"
+    manifest = read_manifest(directory)
+    if manifest is not None:
+        return portfolio_module.Portfolio(file_path, index=open_index(backend, directory), scope=scope), manifest
+
+    previous = _snapshots(backend, tenant)
+    # Seed from the last snapshot so only changed rows are embedded. Chroma
+    # directories aren't safe to copy while a client may hold them open.
+    if backend == "numpy" and previous and not os.path.exists(directory):
+        shutil.copytree(previous[0], directory, ignore=shutil.ignore_patterns(MANIFEST))
+    os.makedirs(directory, exist_ok=True)
+    started = time.perf_counter()
+    portfolio = portfolio_module.Portfolio(file_path, index=open_index(backend, directory), scope=scope)
+    stats = portfolio.load_portfolio()
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "backend": backend,
+        "tenant": tenant,
+        "portfolio_hash": digest,
+        "portfolio_path": os.path.abspath(file_path),
+        "rows": portfolio.index.count(),
+        "build_seconds": round(time.perf_counter() - started, 3),
+        "built_at": time.time(),
+        **stats,
+    }
+    _write_manifest(directory, manifest)
+    _prune(backend, directory, tenant)
+    return portfolio, manifest
+
+
+def warm_up(file_path=None):
+    """Open the portfolio snapshot, load the embedding model and import the LLM stack.
+
+    Returns per-step durations in seconds.
+    """
+    from lazy import lazy_import
+    from resources import get_portfolio
+
+    timings = {}
+    started = time.perf_counter()
+    portfolio = get_portfolio(file_path or default_portfolio_path())
+    timings["open_snapshot"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    # Straight to the vector index: keyword matches would skip loading the embedding model
+    portfolio.index.query(["python"], n_results=1)
+    timings["embedding_model"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    lazy_import("chains")
+    timings["import_chains"] = time.perf_counter() - started
+    return {step: round(seconds, 3) for step, seconds in timings.items()}
+
+
+def warm_up_in_background(file_path=None):
+    """Run :func:`warm_up` once per process on a daemon thread."""
+    global _warm_thread
+    with _warm_lock:
+        if _warm_thread is None:
+            _warm_thread = threading.Thread(target=warm_up, args=(file_path,), name="warm-up", daemon=True)
+            _warm_thread.start()
+        return _warm_thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or warm the portfolio index snapshot.")
+    parser.add_argument("command", choices=("build", "warm"))
+    parser.add_argument("--portfolio", default=None, help="portfolio CSV (default: PORTFOLIO_CSV)")
+    args = parser.parse_args(argv)
+
+    from resources import get_portfolio_snapshot
+
+    if args.command == "build":
+        manifest = get_portfolio_snapshot(args.portfolio or default_portfolio_path())[1]
+        print(json.dumps(manifest, indent=2))
+    else:
+        print(json.dumps(warm_up(args.portfolio), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
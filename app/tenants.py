@@ -0,0 +1,213 @@
+"""
+Tenant Portfolios
+
+Each tenant can bring its own portfolio CSV. Uploads are validated and
+stored under ``TENANT_PORTFOLIO_DIR/<tenant>/<content hash>.csv``, so the
+same file uploaded twice is stored once and every distinct version gets its
+own index snapshot (see snapshot.py). A ``LATEST`` pointer file names the
+tenant's current upload; the CSVs themselves are never rewritten, so an
+open portfolio stays valid. Tenants without an upload use the default
+portfolio.
+
+Named tenants (``?tenant=<id>&token=<token>``) need a token derived from
+``TENANT_SECRET`` (``python app/tenants.py token <id>``); everyone else gets
+a private ``session-...`` tenant. Tenants unused for ``TENANT_RETENTION``
+seconds (``TENANT_SESSION_RETENTION`` for session tenants) are removed,
+uploads and snapshots both (``python app/tenants.py cleanup``).
+"""
+
+import argparse
+import csv
+import hashlib
+import hmac
+import io
+import os
+import re
+import shutil
+import sys
+import time
+import uuid
+
+from snapshot import resolve_path, tenant_snapshot_root
+
+TENANT_PORTFOLIO_MAX_BYTES = int(os.getenv("TENANT_PORTFOLIO_MAX_BYTES", str(1024 * 1024)))
+TENANT_SECRET = os.getenv("TENANT_SECRET", "")
+TENANT_RETENTION = int(os.getenv("TENANT_RETENTION", str(30 * 24 * 3600)))
+TENANT_SESSION_RETENTION = int(os.getenv("TENANT_SESSION_RETENTION", str(24 * 3600)))
+REQUIRED_COLUMNS = ("Techstack", "Links")
+LATEST = "LATEST"
+SESSION_PREFIX = "session-"
+_TOUCH_INTERVAL = 3600  # refresh a tenant's last-use time at most this often
+_TENANT_ID = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+
+def tenant_root():
+    return resolve_path(os.getenv("TENANT_PORTFOLIO_DIR", os.path.join("app", "tenants")))
+
+
+def normalize_tenant(tenant):
+    """Lowercased tenant id; raises ValueError if it isn't safe to use as a directory name."""
+    tenant = str(tenant or "").strip().lower()
+    if not _TENANT_ID.match(tenant):
+        raise ValueError("Tenant ids may only contain letters, digits, '-' and '_' (at most 63 characters).")
+    return tenant
+
+
+def session_tenant():
+    """A fresh private tenant id for one browser session."""
+    return SESSION_PREFIX + uuid.uuid4().hex[:12]
+
+
+def tenant_token(tenant):
+    """Access token for a named tenant; raises ValueError without ``TENANT_SECRET``."""
+    tenant = normalize_tenant(tenant)
+    if not TENANT_SECRET:
+        raise ValueError("Set TENANT_SECRET to use named tenants.")
+    if tenant.startswith(SESSION_PREFIX):
+        raise ValueError(f"Tenant ids starting with {SESSION_PREFIX!r} are reserved for sessions.")
+    return hmac.new(TENANT_SECRET.encode("utf-8"), tenant.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+
+def authenticate_tenant(tenant, token):
+    """The normalized tenant id if ``token`` grants access to it, else None."""
+    try:
+        expected = tenant_token(tenant)
+    except ValueError:
+        return None
+    return normalize_tenant(tenant) if hmac.compare_digest(expected, str(token or "")) else None
+
+
+def validate_portfolio_csv(data):
+    """Return the number of usable rows in an uploaded CSV, or raise ValueError."""
+    if len(data) > TENANT_PORTFOLIO_MAX_BYTES:
+        raise ValueError(f"Portfolio CSV is larger than {TENANT_PORTFOLIO_MAX_BYTES // 1024} KB.")
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("Portfolio CSV must be UTF-8 encoded.") from None
+    reader = csv.DictReader(io.StringIO(text))
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"Portfolio CSV is missing the column(s): {', '.join(missing)}.")
+    rows = sum(1 for row in reader if all((row.get(column) or "").strip() for column in REQUIRED_COLUMNS))
+    if not rows:
+        raise ValueError("Portfolio CSV has no rows with both Techstack and Links.")
+    return rows
+
+
+def _tenant_dir(tenant):
+    return os.path.join(tenant_root(), normalize_tenant(tenant))
+
+
+def _write_atomic(path, data):
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+
+
+def save_portfolio_upload(tenant, data):
+    """Validate and store an uploaded portfolio CSV and make it the tenant's latest; returns its path.
+
+    Saving the same content again changes nothing on disk, so it is cheap to
+    call on every Streamlit rerun.
+    """
+    validate_portfolio_csv(data)
+    directory = _tenant_dir(tenant)
+    name = hashlib.sha256(data).hexdigest()[:16] + ".csv"
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        _write_atomic(path, data)
+    pointer = os.path.join(directory, LATEST)
+    try:
+        with open(pointer, encoding="utf-8") as f:
+            current = f.read().strip()
+    except FileNotFoundError:
+        current = None
+    if current != name:
+        _write_atomic(pointer, name.encode("utf-8"))
+        _prune_uploads(directory, keep=name)
+    return path
+
+
+def _prune_uploads(directory, keep):
+    """Drop superseded uploads that nobody has replaced the latest with for a full retention period."""
+    cutoff = time.time() - TENANT_RETENTION
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.endswith(".csv") and name != keep and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+
+
+def latest_portfolio(tenant):
+    """Path of the tenant's most recently uploaded portfolio, or None."""
+    directory = _tenant_dir(tenant)
+    try:
+        with open(os.path.join(directory, LATEST), encoding="utf-8") as f:
+            path = os.path.join(directory, os.path.basename(f.read().strip()))
+    except FileNotFoundError:
+        return None
+    return path if os.path.isfile(path) else None
+
+
+def touch_tenant(tenant):
+    """Record that the tenant is in use, postponing its cleanup (the CSVs are left untouched)."""
+    pointer = os.path.join(_tenant_dir(tenant), LATEST)
+    try:
+        if time.time() - os.path.getmtime(pointer) > _TOUCH_INTERVAL:
+            os.utime(pointer)
+    except FileNotFoundError:
+        pass
+
+
+def expired_tenants(now=None):
+    """Tenants whose portfolios haven't been used within their retention period."""
+    now = now or time.time()
+    expired = []
+    for root in (tenant_root(), tenant_snapshot_root()):
+        try:
+            names = os.listdir(root)
+        except FileNotFoundError:
+            continue
+        for tenant in names:
+            if tenant in expired or not _TENANT_ID.match(tenant):
+                continue
+            directory = os.path.join(tenant_root(), tenant)
+            pointer = os.path.join(directory, LATEST)
+            last_used = max((os.path.getmtime(path) for path in (pointer, directory, os.path.join(root, tenant))
+                             if os.path.exists(path)), default=0)
+            retention = TENANT_SESSION_RETENTION if tenant.startswith(SESSION_PREFIX) else TENANT_RETENTION
+            if now - last_used > retention:
+                expired.append(tenant)
+    return expired
+
+
+def remove_tenant(tenant):
+    """Delete a tenant's uploads and index snapshots."""
+    tenant = normalize_tenant(tenant)
+    for directory in (os.path.join(tenant_root(), tenant), os.path.join(tenant_snapshot_root(), tenant)):
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage tenant portfolios.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    token = commands.add_parser("token", help="print the access token for a named tenant")
+    token.add_argument("tenant")
+    commands.add_parser("cleanup", help="remove tenants unused for their retention period")
+    args = parser.parse_args(argv)
+
+    if args.command == "token":
+        try:
+            print(tenant_token(args.tenant))
+        except ValueError as e:
+            parser.error(str(e))
+        return 0
+    for tenant in expired_tenants():
+        remove_tenant(tenant)
+        print(f"removed {tenant}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
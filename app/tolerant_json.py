@@ -0,0 +1,121 @@
+"""
+Tolerant JSON Parsing for Model Output
+
+Extraction output is meant to be a JSON array of job objects, but models
+add prose around it, stop mid-array, or switch to single quotes. Instead of
+rejecting the whole response, :func:`salvage_json` walks it once, keeps
+every object that parses (strictly, or after light fixes for quotes,
+Python literals and trailing commas) and returns the fragments it could
+not parse, so only those need a repair call.
+"""
+
+import ast
+import json
+import re
+from dataclasses import dataclass, field
+from typing import List
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_JSON_LITERALS = re.compile(r"\b(true|false|null)\b")
+
+
+@dataclass
+class SalvageResult:
+    objects: List[dict] = field(default_factory=list)
+    broken: List[str] = field(default_factory=list)
+    clean: bool = False  # the whole output parsed as strict JSON
+
+
+def _loads_lenient(text):
+    """Parse one JSON value, tolerating single quotes, Python literals and trailing commas."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    fixed = _TRAILING_COMMA.sub(r"\1", text)
+    try:
+        return json.loads(fixed)
+    except ValueError:
+        pass
+    # Single-quoted output; only rewrite JSON literals if Python rejects them,
+    # since the rewrite can also touch words inside strings
+    python_literals = {"true": "True", "false": "False", "null": "None"}
+    for candidate in (fixed, _JSON_LITERALS.sub(lambda m: python_literals[m.group(1)], fixed)):
+        try:
+            return ast.literal_eval(candidate)
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            continue
+    raise ValueError("not a JSON value")
+
+
+def _as_objects(value):
+    """Job objects in a parsed value: a list of them, one object, or one wrapped as ``{"jobs": [...]}``."""
+    if isinstance(value, list):
+        return [item for item in value if isinstance(item, dict)]
+    if isinstance(value, dict):
+        lists = [item for item in value.values() if isinstance(item, list)]
+        if "role" not in value and len(lists) == 1 and all(isinstance(item, dict) for item in lists[0]):
+            return list(lists[0])
+        return [value]
+    return []
+
+
+def _object_spans(text):
+    """Yield ``(start, end)`` of each top-level object, and of a trailing unterminated one.
+
+    Top-level means the root object or the objects directly inside the root
+    array. Scanning stops when the root value closes, so prose after it is
+    ignored.
+    """
+    stack = []
+    quote = None
+    escaped = False
+    start = None
+    for i, char in enumerate(text):
+        if quote:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+            continue
+        if char in "\"'" and stack:
+            quote = char
+        elif char in "[{":
+            if char == "{" and (not stack or stack == ["["]):
+                start = i
+            stack.append(char)
+        elif char in "]}" and stack:
+            stack.pop()
+            if char == "}" and start is not None and (not stack or stack == ["["]):
+                yield start, i + 1
+                start = None
+            if not stack:
+                return
+    if start is not None:
+        yield start, len(text)
+
+
+def salvage_json(text):
+    """Recover every parseable job object from model output; see :class:`SalvageResult`."""
+    text = text or ""
+    fenced = _FENCE.search(text)
+    body = fenced.group(1) if fenced else text
+    try:
+        return SalvageResult(objects=_as_objects(json.loads(body)), clean=True)
+    except ValueError:
+        pass
+
+    result = SalvageResult()
+    root = min((i for i in (body.find("["), body.find("{")) if i >= 0), default=-1)
+    if root < 0:
+        return result
+    for start, end in _object_spans(body[root:]):
+        fragment = body[root + start:root + end]
+        try:
+            result.objects.extend(_as_objects(_loads_lenient(fragment)))
+        except ValueError:
+            result.broken.append(fragment)
+    return result
@@ -0,0 +1,363 @@
+"""
+Speech-to-Text for Audio Uploads
+
+Uploads are transcribed off the Streamlit script thread. ``submit`` hashes
+the audio and returns a :class:`TranscriptionJob` straight away; a
+coordinator thread spools the file to disk and splits it into
+``STT_CHUNK_SECONDS`` windows. Each window is decoded (WAV with the
+standard library and numpy, other formats through pydub/ffmpeg reading only
+that window), mixed down to 16 kHz mono and recognized in a shared process
+pool. Every job keeps at most ``STT_WORKERS`` chunks in the pool at once,
+so a long upload queues behind other sessions' chunks instead of holding
+them up.
+
+Engines (``STT_ENGINE``):
+
+- ``sphinx`` (default): offline, PocketSphinx's bundled US English model.
+- ``google``: SpeechRecognition's free web API, in ``STT_LANGUAGE``.
+- ``package.module:function``: any callable taking
+  ``(pcm_bytes, sample_rate, language)`` and returning text.
+
+Finished transcripts are cached by engine, language and audio hash in a
+small SQLite file, so the same recording isn't transcribed twice. Entries
+expire after ``TRANSCRIPT_CACHE_TTL`` seconds, and beyond
+``TRANSCRIPT_CACHE_MAX_ENTRIES`` the least recently used ones are evicted.
+"""
+
+import functools
+import hashlib
+import importlib
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import wave
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+from lazy import lazy_import
+from metrics import REGISTRY
+from snapshot import resolve_path
+
+STT_ENGINE = os.getenv("STT_ENGINE", "sphinx")
+STT_LANGUAGE = os.getenv("STT_LANGUAGE", "en-US")
+STT_WORKERS = max(int(os.getenv("STT_WORKERS", str(max((os.cpu_count() or 2) // 2, 1)))), 1)
+STT_CHUNK_SECONDS = float(os.getenv("STT_CHUNK_SECONDS", "30"))
+STT_SAMPLE_RATE = 16000
+AUDIO_SPOOL_DIR = resolve_path(os.getenv("AUDIO_SPOOL_DIR", ".cache/audio"))
+TRANSCRIPT_CACHE_PATH = resolve_path(os.getenv("TRANSCRIPT_CACHE_PATH", ".cache/transcripts.sqlite3"))
+TRANSCRIPT_CACHE_TTL = float(os.getenv("TRANSCRIPT_CACHE_TTL", str(30 * 24 * 3600)))
+TRANSCRIPT_CACHE_MAX_ENTRIES = int(os.getenv("TRANSCRIPT_CACHE_MAX_ENTRIES", "1000"))
+
+
+class TranscriptionError(RuntimeError):
+    """The audio could not be decoded or the engine could not run."""
+
+
+# --- Engines (run in the worker processes) ---
+
+@functools.lru_cache(maxsize=None)
+def _sphinx_decoder(sample_rate):
+    try:
+        from pocketsphinx import Decoder
+    except ImportError:
+        raise TranscriptionError("The sphinx engine needs the pocketsphinx package.") from None
+    return Decoder(samprate=sample_rate)
+
+
+def _recognize_sphinx(pcm, sample_rate, language):
+    decoder = _sphinx_decoder(sample_rate)
+    decoder.start_utt()
+    decoder.process_raw(pcm, full_utt=True)
+    decoder.end_utt()
+    hypothesis = decoder.hyp()
+    return hypothesis.hypstr if hypothesis is not None else ""
+
+
+def _recognize_google(pcm, sample_rate, language):
+    try:
+        import speech_recognition as sr
+    except ImportError:
+        raise TranscriptionError("The google engine needs the SpeechRecognition package.") from None
+    try:
+        return sr.Recognizer().recognize_google(sr.AudioData(pcm, sample_rate, 2), language=language)
+    except sr.UnknownValueError:
+        return ""  # nothing intelligible in this chunk
+    except sr.RequestError as e:
+        raise TranscriptionError(f"Google speech recognition failed: {e}") from None
+
+
+ENGINES = {"sphinx": _recognize_sphinx, "google": _recognize_google}
+
+
+def resolve_engine(name):
+    """Recognizer function for an engine name or a ``module:function`` path."""
+    if name in ENGINES:
+        return ENGINES[name]
+    module, _, function = name.partition(":")
+    if not function:
+        raise TranscriptionError(f"Unknown STT_ENGINE {name!r} (expected {', '.join(ENGINES)} or module:function)")
+    try:
+        return getattr(importlib.import_module(module), function)
+    except (ImportError, AttributeError) as e:
+        raise TranscriptionError(f"Cannot load STT engine {name!r}: {e}") from None
+
+
+# --- Decoding ---
+
+def _wav_params(path):
+    """``(channels, sample width, rate, frames)`` of a PCM WAV file, or None for anything else."""
+    try:
+        with wave.open(path, "rb") as f:
+            return f.getnchannels(), f.getsampwidth(), f.getframerate(), f.getnframes()
+    except (wave.Error, EOFError):
+        return None
+
+
+def audio_duration(path):
+    """Length of an audio file in seconds."""
+    params = _wav_params(path)
+    if params is not None:
+        return params[3] / params[2]
+    try:
+        from pydub.utils import mediainfo
+    except ImportError:
+        raise TranscriptionError("Decoding non-WAV audio needs the pydub package (and ffmpeg).") from None
+    try:
+        return float(mediainfo(path)["duration"])
+    except (KeyError, ValueError):
+        raise TranscriptionError("Could not read the audio duration; is ffmpeg installed?") from None
+
+
+def _pcm_to_float(frames, width):
+    """Interleaved little-endian PCM samples of ``width`` bytes as float32 in [-1, 1)."""
+    np = lazy_import("numpy")
+    if width == 1:
+        return (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0  # 8-bit WAV is unsigned
+    if width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        samples = np.where(samples >= 1 << 23, samples - (1 << 24), samples)
+        return samples.astype(np.float32) / float(1 << 23)
+    dtype = {2: np.int16, 4: np.int32}[width]
+    return np.frombuffer(frames, dtype=dtype).astype(np.float32) / float(1 << (8 * width - 1))
+
+
+def read_chunk(path, start, seconds):
+    """``seconds`` of audio from ``start`` as 16-bit mono PCM at ``STT_SAMPLE_RATE``.
+
+    Only that window is decoded, so memory use doesn't grow with the file.
+    """
+    params = _wav_params(path)
+    if params is not None and params[1] in (1, 2, 3, 4):
+        np = lazy_import("numpy")
+        channels, width, rate, _ = params
+        with wave.open(path, "rb") as f:
+            f.setpos(min(int(start * rate), f.getnframes()))
+            frames = f.readframes(int(seconds * rate))
+        samples = _pcm_to_float(frames, width)
+        samples = samples[:len(samples) // channels * channels].reshape(-1, channels).mean(axis=1)
+        if rate != STT_SAMPLE_RATE and len(samples):
+            # Linear interpolation is plenty for speech recognition at 16 kHz
+            times = np.arange(int(len(samples) * STT_SAMPLE_RATE / rate)) * (rate / STT_SAMPLE_RATE)
+            samples = np.interp(times, np.arange(len(samples)), samples)
+        return (np.clip(samples, -1.0, 1.0 - 1 / 32768) * 32768).astype("<i2").tobytes()
+    try:
+        from pydub import AudioSegment
+    except ImportError:
+        raise TranscriptionError("Decoding this audio format needs the pydub package (and ffmpeg).") from None
+    segment = AudioSegment.from_file(path, start_second=start, duration=seconds)
+    return segment.set_channels(1).set_sample_width(2).set_frame_rate(STT_SAMPLE_RATE).raw_data
+
+
+def _transcribe_chunk(path, start, seconds, engine, language):
+    """Worker entry point: decode one window and recognize it."""
+    pcm = read_chunk(path, start, seconds)
+    if not pcm:
+        return ""
+    return resolve_engine(engine)(pcm, STT_SAMPLE_RATE, language)
+
+
+# --- Cache ---
+
+class TranscriptCache:
+    """SQLite store of finished transcripts keyed by engine, language and audio hash, with TTL and LRU eviction."""
+
+    def __init__(self, path=TRANSCRIPT_CACHE_PATH, ttl_seconds=TRANSCRIPT_CACHE_TTL,
+                 max_entries=TRANSCRIPT_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS transcripts (key TEXT PRIMARY KEY, text TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(transcripts)")}
+        if "accessed" not in columns:
+            self._conn.execute("ALTER TABLE transcripts ADD COLUMN accessed REAL NOT NULL DEFAULT 0")
+            self._conn.execute("UPDATE transcripts SET accessed = created")
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT text, created FROM transcripts WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM transcripts WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is not None:
+                self._conn.execute("UPDATE transcripts SET accessed = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+        REGISTRY.inc("transcript_cache_requests_total", result="hit" if row else "miss")
+        return row[0] if row else None
+
+    def set(self, key, text):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transcripts (key, text, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, text, now, now),
+            )
+            self._conn.execute("DELETE FROM transcripts WHERE created < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM transcripts WHERE key IN ("
+                "SELECT key FROM transcripts ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+
+# --- Scheduling ---
+
+@dataclass
+class TranscriptionJob:
+    """One upload being transcribed; ``future`` resolves to the transcript text."""
+    key: str
+    filename: str
+    future: Future
+    total_chunks: int = 0
+    done_chunks: int = 0
+    cached: bool = False
+
+    def done(self):
+        return self.future.done()
+
+    @property
+    def progress(self):
+        return self.done_chunks / self.total_chunks if self.total_chunks else (1.0 if self.done() else 0.0)
+
+
+class Transcriber:
+    """Chunked transcription in a process pool, with single-flight per audio hash and a transcript cache."""
+
+    def __init__(self, engine=STT_ENGINE, language=STT_LANGUAGE, workers=STT_WORKERS,
+                 chunk_seconds=STT_CHUNK_SECONDS, cache=None, spool_dir=AUDIO_SPOOL_DIR):
+        self.engine = engine
+        self.language = language
+        self.workers = workers
+        self.chunk_seconds = chunk_seconds
+        self.cache = cache
+        self.spool_dir = spool_dir
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._pool = None
+        # Coordinators only wait on the process pool; the pool bounds the CPU work
+        self._coordinators = ThreadPoolExecutor(max_workers=8, thread_name_prefix="stt")
+
+    def _process_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # Spawn rather than fork: the Streamlit server process is full of threads
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def submit(self, data, filename="audio"):
+        """Start transcribing ``data`` (the uploaded file's bytes); never blocks on the work itself."""
+        key = f"{self.engine}:{self.language}:{hashlib.sha256(data).hexdigest()}"
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            return TranscriptionJob(key, filename, future, cached=True)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                return job
+            job = TranscriptionJob(key, filename, Future())
+            self._jobs[key] = job
+        self._coordinators.submit(self._run, job, data)
+        return job
+
+    def _run(self, job, data):
+        started = time.perf_counter()
+        spool_name = hashlib.sha1(job.key.encode("utf-8")).hexdigest() + os.path.splitext(job.filename)[1].lower()
+        path = os.path.join(self.spool_dir, spool_name)
+        try:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+            text = self._transcribe(job, path)
+        except Exception as e:
+            text, error = None, e
+        else:
+            error = None
+        finally:
+            # Clean up before resolving, so a finished job leaves nothing behind
+            if os.path.exists(path):
+                os.remove(path)
+            with self._lock:
+                self._jobs.pop(job.key, None)
+        if error is not None:
+            REGISTRY.inc("transcriptions_total", result="error")
+            job.future.set_exception(error)
+            return
+        if self.cache is not None:
+            self.cache.set(job.key, text)
+        REGISTRY.observe("transcription_duration_seconds", time.perf_counter() - started)
+        REGISTRY.inc("transcriptions_total", result="ok")
+        job.future.set_result(text)
+
+    def _transcribe(self, job, path):
+        duration = audio_duration(path)
+        starts = [i * self.chunk_seconds for i in range(max(int(-(-duration // self.chunk_seconds)), 1))]
+        job.total_chunks = len(starts)
+        texts = [""] * len(starts)
+        pool = self._process_pool()
+        pending = {}
+        next_chunk = 0
+        try:
+            while next_chunk < len(starts) or pending:
+                # A bounded window per job interleaves concurrent uploads in the pool's queue
+                while next_chunk < len(starts) and len(pending) < self.workers:
+                    chunk = pool.submit(_transcribe_chunk, path, starts[next_chunk], self.chunk_seconds,
+                                        self.engine, self.language)
+                    pending[chunk] = next_chunk
+                    next_chunk += 1
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for chunk in done:
+                    texts[pending.pop(chunk)] = (chunk.result() or "").strip()
+                    job.done_chunks += 1
+        finally:
+            for chunk in pending:
+                chunk.cancel()
+        return " ".join(part for part in texts if part)
+
+
+_default_transcriber = None
+_default_transcriber_lock = threading.Lock()
+
+
+def get_transcriber():
+    """Process-wide transcriber shared by every Streamlit session."""
+    global _default_transcriber
+    with _default_transcriber_lock:
+        if _default_transcriber is None:
+            disabled = os.getenv("TRANSCRIPT_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+            _default_transcriber = Transcriber(cache=None if disabled else TranscriptCache())
+        return _default_transcriber
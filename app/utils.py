@@ -1,16 +1,148 @@
 import re
 
+# HTML tags, URLs and any character that is not a letter, digit, whitespace
+# or punctuation that carries meaning in skill names ("C++", "C#", "Node.js",
+# "CI/CD", "R&D"), matched in one alternation so the page is scanned once.
+# Every match becomes a space, so words on either side of a tag stay apart.
+_STRIP_PATTERN = re.compile(r"<[^>]*>|https?://\S+|[^\w\s+#./&,'-]+")
+
+# Longest unterminated tag the streaming cleaner holds back before giving up
+# and treating the "<" as plain text
+_MAX_PENDING_CHARS = 64 * 1024
+
+
+def _collapse_whitespace(text):
+    """Collapse whitespace runs to one space per line and drop blank lines."""
+    return '\n'.join(filter(None, (' '.join(line.split()) for line in text.split('\n'))))
+
+
 def clean_text(text):
-    # Remove HTML tags
-    text = re.sub(r'<[^>]*?>', '', text)
-    # Remove URLs
-    text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', text)
-    # Remove special characters
-    text = re.sub(r'[^a-zA-Z0-9 ]', '', text)
-    # Replace multiple spaces with a single space
-    text = re.sub(r'\s{2,}', ' ', text)
-    # Trim leading and trailing whitespace
+    """Strip tags, URLs and noise characters from scraped page text.
+
+    Unicode letters and skill punctuation are kept. Whitespace collapses to
+    single spaces within a line; line breaks survive (blank lines dropped) so
+    later stages can split the page on posting boundaries.
+    """
+    return _collapse_whitespace(_STRIP_PATTERN.sub(' ', text))
+
+
+class TextCleaner:
+    """Incremental version of :func:`clean_text` for text arriving in chunks.
+
+    ``feed`` returns the cleaned text that is safe to emit so far; a trailing
+    word, URL or unterminated tag is held back until the next chunk shows
+    where it ends. Joining every ``feed`` result and the final ``flush``
+    gives the same text as ``clean_text`` on the whole input.
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self._separator = ""
+        self._started = False
+
+    def feed(self, chunk):
+        text = self._pending + chunk
+        cut = _safe_cut(text)
+        self._pending = text[cut:]
+        return self._emit(text[:cut])
+
+    def flush(self):
+        text, self._pending = self._pending, ""
+        out = self._emit(text)
+        self._separator = ""
+        return out
+
+    def _emit(self, text):
+        stripped = _STRIP_PATTERN.sub(' ', text)
+        body = _collapse_whitespace(stripped)
+        if not body:
+            self._separator = _join_separator(self._separator, stripped)
+            return ""
+        leading = stripped[:len(stripped) - len(stripped.lstrip())]
+        trailing = stripped[len(stripped.rstrip()):]
+        separator = _join_separator(self._separator, leading)
+        out = (separator if self._started else "") + body
+        self._started = True
+        self._separator = trailing
+        return out
+
+
+def iter_clean_text(chunks):
+    """Clean an iterable of text chunks lazily, yielding cleaned pieces."""
+    cleaner = TextCleaner()
+    for chunk in chunks:
+        piece = cleaner.feed(chunk)
+        if piece:
+            yield piece
+    tail = cleaner.flush()
+    if tail:
+        yield tail
+
+
+def _safe_cut(text):
+    """Index up to which ``text`` can be cleaned without seeing more input."""
+    cut = max(text.rfind(' '), text.rfind('\n'), text.rfind('\t')) + 1
+    # Never cut inside a tag: hold back from the first "<" after the last ">"
+    open_tag = text.find('<', text.rfind('>', 0, cut) + 1, cut)
+    if open_tag != -1 and len(text) - open_tag <= _MAX_PENDING_CHARS:
+        cut = open_tag
+    return cut
+
+
+def _join_separator(*gaps):
+    """Whitespace to put between two emitted pieces, given the gaps around them."""
+    gap = "".join(gaps)
+    if '\n' in gap:
+        return '\n'
+    return ' ' if gap else ''
+
+
+# Rough characters-per-token ratio for English text with Llama tokenizers
+CHARS_PER_TOKEN = 4
+
+# Separators tried in order when splitting text, from strongest boundary
+# (blank line between postings) to weakest (any whitespace)
+_CHUNK_SEPARATORS = [re.compile(r'\n\s*\n'), re.compile(r'\n'), re.compile(r'(?<=[.!?])\s+'), re.compile(r'\s+')]
+
+
+def estimate_tokens(text):
+    """Cheap token estimate used for prompt budgeting."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def split_into_chunks(text, max_tokens):
+    """Split text into chunks of at most ``max_tokens`` estimated tokens.
+
+    Splits on the strongest boundary available (blank lines, then lines,
+    then sentences, then words) so postings stay whole where possible, and
+    packs neighbouring pieces back together up to the limit.
+    """
+    # Largest length estimate_tokens still counts as max_tokens, so chunks pass the same budget check
+    max_chars = max((max_tokens - 1) * CHARS_PER_TOKEN + CHARS_PER_TOKEN - 1, 1)
+    pieces = _split_recursive(text, max_chars, 0)
+
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _split_recursive(text, max_chars, level):
     text = text.strip()
-    # Remove extra whitespace
-    text = ' '.join(text.split())
-    return text
\ No newline at end of file
+    if not text:
+        return []
+    if len(text) <= max_chars:
+        return [text]
+    if level >= len(_CHUNK_SEPARATORS):
+        return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+    pieces = []
+    for part in _CHUNK_SEPARATORS[level].split(text):
+        pieces.extend(_split_recursive(part, max_chars, level + 1))
+    return pieces
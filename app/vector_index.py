@@ -0,0 +1,204 @@
+"""
+Portfolio Vector Index Backends
+
+``Portfolio`` stores and searches its rows through one of two backends:
+
+- ``numpy`` (default): embeddings held as one contiguous float32 matrix and
+  searched with a single matrix product per batch of queries. Persisted as a
+  memory-mapped ``.npy`` file plus a JSON sidecar with ids and metadata.
+  Suited to the small and medium portfolios this app ships with.
+- ``chroma``: a Chroma collection, for portfolios too large to scan.
+
+Select one with ``PORTFOLIO_INDEX_BACKEND``. Both report squared L2
+distances, so ``PORTFOLIO_MAX_DISTANCE`` means the same thing either way.
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+
+from snapshot import index_root
+
+PORTFOLIO_INDEX_BACKEND = os.getenv("PORTFOLIO_INDEX_BACKEND", "numpy").lower()
+COLLECTION_NAME = "portfolio"
+
+
+def default_embedding_function():
+    """Chroma's default sentence embedding model, without opening a Chroma client."""
+    from chromadb.utils import embedding_functions
+
+    return embedding_functions.DefaultEmbeddingFunction()
+
+
+class ChromaIndex:
+    """Index backed by a Chroma collection."""
+
+    def __init__(self, client, name=COLLECTION_NAME, embedding_function=None):
+        self.client = client
+        options = {"embedding_function": embedding_function} if embedding_function is not None else {}
+        self.collection = client.get_or_create_collection(name=name, **options)
+
+    def ids(self):
+        return self.collection.get(include=[])["ids"]
+
+    def count(self):
+        return self.collection.count()
+
+    def delete(self, ids):
+        if ids:
+            self.collection.delete(ids=list(ids))
+
+    def add(self, ids, documents, metadatas):
+        batch_size = getattr(self.client, "max_batch_size", 0)
+        if batch_size <= 0:
+            batch_size = max(len(ids), 1)
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            self.collection.add(ids=ids[start:end], documents=documents[start:end],
+                                metadatas=metadatas[start:end])
+
+    def query(self, texts, n_results):
+        """Return ``(metadatas, distances)``, one list per query text."""
+        res = self.collection.query(query_texts=texts, n_results=n_results,
+                                    include=["metadatas", "distances"])
+        return res["metadatas"], res["distances"]
+
+
+class NumpyIndex:
+    """Brute-force index over a float32 embedding matrix, persisted as ``<path>.npy``.
+
+    Writes replace the files atomically and swap in a fresh memory map, so
+    concurrent queries always see a consistent snapshot.
+    """
+
+    def __init__(self, path, embedding_function=None):
+        self.path = path
+        self.embedding_function = embedding_function or default_embedding_function()
+        self._embedding_name = type(self.embedding_function).__name__
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._state = self._load()
+
+    @property
+    def matrix_path(self):
+        return self.path + ".npy"
+
+    @property
+    def sidecar_path(self):
+        return self.path + ".json"
+
+    def _empty_state(self):
+        return {"ids": [], "documents": [], "metadatas": [],
+                "matrix": np.empty((0, 0), dtype=np.float32), "sq_norms": np.empty(0, dtype=np.float32)}
+
+    def _load(self):
+        try:
+            with open(self.sidecar_path, encoding="utf-8") as f:
+                sidecar = json.load(f)
+        except (OSError, ValueError):
+            return self._empty_state()
+        # Rows embedded by another model can't be compared; start over and let the sync re-add them
+        if sidecar.get("embedding_function") != self._embedding_name or not sidecar["ids"]:
+            return self._empty_state()
+        try:
+            matrix = np.load(self.matrix_path, mmap_mode="r")
+        except (OSError, ValueError):
+            return self._empty_state()
+        if matrix.shape[0] != len(sidecar["ids"]):
+            return self._empty_state()
+        return self._state_for(sidecar["ids"], sidecar["documents"], sidecar["metadatas"], matrix)
+
+    @staticmethod
+    def _state_for(ids, documents, metadatas, matrix):
+        sq_norms = np.einsum("ij,ij->i", matrix, matrix) if len(ids) else np.empty(0, dtype=np.float32)
+        return {"ids": ids, "documents": documents, "metadatas": metadatas,
+                "matrix": matrix, "sq_norms": sq_norms}
+
+    def _embed(self, texts):
+        return np.ascontiguousarray(self.embedding_function(input=list(texts)), dtype=np.float32)
+
+    def _write(self, ids, documents, metadatas, matrix):
+        if not ids:
+            for path in (self.matrix_path, self.sidecar_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            return self._empty_state()
+        matrix_tmp = self.path + ".tmp.npy"
+        np.save(matrix_tmp, np.ascontiguousarray(matrix, dtype=np.float32))
+        sidecar_tmp = self.sidecar_path + ".tmp"
+        with open(sidecar_tmp, "w", encoding="utf-8") as f:
+            json.dump({"embedding_function": self._embedding_name, "ids": ids,
+                       "documents": documents, "metadatas": metadatas}, f)
+        os.replace(matrix_tmp, self.matrix_path)
+        os.replace(sidecar_tmp, self.sidecar_path)
+        return self._state_for(ids, documents, metadatas, np.load(self.matrix_path, mmap_mode="r"))
+
+    def ids(self):
+        return list(self._state["ids"])
+
+    def count(self):
+        return len(self._state["ids"])
+
+    def delete(self, ids):
+        drop = set(ids)
+        if not drop:
+            return
+        with self._lock:
+            state = self._state
+            keep = [i for i, id_ in enumerate(state["ids"]) if id_ not in drop]
+            self._state = self._write([state["ids"][i] for i in keep],
+                                      [state["documents"][i] for i in keep],
+                                      [state["metadatas"][i] for i in keep],
+                                      np.asarray(state["matrix"][keep]) if keep else None)
+
+    def add(self, ids, documents, metadatas):
+        if not ids:
+            return
+        embeddings = self._embed(documents)
+        with self._lock:
+            state = self._state
+            matrix = np.vstack([state["matrix"], embeddings]) if state["ids"] else embeddings
+            self._state = self._write(state["ids"] + list(ids), state["documents"] + list(documents),
+                                      state["metadatas"] + list(metadatas), matrix)
+
+    def query(self, texts, n_results):
+        """Return ``(metadatas, distances)``, one list per query text."""
+        state = self._state
+        count = len(state["ids"])
+        if not texts or not count:
+            return [[] for _ in texts], [[] for _ in texts]
+        k = min(n_results, count)
+        queries = self._embed(texts)
+        # Squared L2 for every (query, row) pair from one matrix product
+        distances = (np.einsum("ij,ij->i", queries, queries)[:, None] + state["sq_norms"][None, :]
+                     - 2.0 * (queries @ state["matrix"].T))
+        np.maximum(distances, 0.0, out=distances)
+        if k < count:
+            top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(count), (len(texts), count))
+        top_distances = np.take_along_axis(distances, top, axis=1)
+        order = np.argsort(top_distances, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_distances = np.take_along_axis(top_distances, order, axis=1)
+        metadatas = [[state["metadatas"][j] for j in row] for row in top.tolist()]
+        return metadatas, top_distances.tolist()
+
+
+def open_index(backend=None, persist_directory=None, chroma_client=None, embedding_function=None):
+    """Open the configured portfolio index backend."""
+    backend = (backend or PORTFOLIO_INDEX_BACKEND).lower()
+    persist_directory = persist_directory or index_root()
+    if backend == "chroma":
+        if chroma_client is None:
+            import chromadb
+
+            chroma_client = chromadb.PersistentClient(persist_directory)
+        return ChromaIndex(chroma_client, embedding_function=embedding_function)
+    if backend == "numpy":
+        return NumpyIndex(os.path.join(persist_directory, COLLECTION_NAME),
+                          embedding_function=embedding_function)
+    raise ValueError(f"Unknown PORTFOLIO_INDEX_BACKEND: {backend!r} (expected 'numpy' or 'chroma')")
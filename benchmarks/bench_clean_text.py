@@ -0,0 +1,69 @@
+"""
+clean_text Throughput Benchmark
+
+Measures clean_text (one-shot and streaming) on synthetic careers pages of
+increasing size and reports MB/s, next to the previous five-pass regex
+implementation for reference.
+
+Usage:
+    python benchmarks/bench_clean_text.py [--sizes 100000 1000000 10000000] [--repeat 5]
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from utils import clean_text, iter_clean_text  # noqa: E402
+from fixtures import careers_page_of_size  # noqa: E402
+
+
+def legacy_clean_text(text):
+    """The original multi-pass implementation, kept as a baseline."""
+    text = re.sub(r'<[^>]*?>', '', text)
+    text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', text)
+    text = re.sub(r'[^a-zA-Z0-9 ]', '', text)
+    text = re.sub(r'\s{2,}', ' ', text)
+    text = text.strip()
+    return ' '.join(text.split())
+
+
+def streaming_clean_text(text, chunk_size=64 * 1024):
+    chunks = (text[i:i + chunk_size] for i in range(0, len(text), chunk_size))
+    return "".join(iter_clean_text(chunks))
+
+
+def best_of(fn, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    implementations = [
+        ("clean_text", clean_text),
+        ("clean_text (streaming)", streaming_clean_text),
+        ("legacy (5 passes)", legacy_clean_text),
+    ]
+    print(f"{'implementation':<24} {'size':>10} {'best s':>9} {'MB/s':>8}")
+    for size in args.sizes:
+        html = careers_page_of_size(size)
+        megabytes = len(html.encode("utf-8")) / 1e6
+        for name, fn in implementations:
+            elapsed = best_of(fn, html, args.repeat)
+            print(f"{name:<24} {megabytes:>8.1f}MB {elapsed:>9.4f} {megabytes / elapsed:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
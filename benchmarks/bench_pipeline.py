@@ -0,0 +1,151 @@
+"""
+Offline End-to-End Pipeline Benchmark
+
+Runs clean_text, load_portfolio, query_links, extract_jobs, write_mail and
+the full generate_emails pipeline over the fixture careers pages in
+benchmarks/pages, with a fake chat model (configurable latency and token
+rate) and a hashing embedding function, so no network is needed. Reports
+latency percentiles and throughput per stage.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--latency 0.2] [--tokens-per-second 300] [--repeat 3]
+                                        [--index numpy|chroma] [--json out.json]
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(BENCH_DIR), "app")
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+# Keep the benchmark hermetic: no cache or registry files, no rate limiting, no telemetry calls
+os.environ["LLM_CACHE_DISABLED"] = "1"
+os.environ["DEDUPE_REGISTRY_DISABLED"] = "1"
+os.environ["GROQ_RPM"] = os.environ["GROQ_TPM"] = "0"
+
+import chromadb  # noqa: E402
+from chromadb.config import Settings  # noqa: E402
+
+from chains import Chain  # noqa: E402
+from fetch import FetchedPage, html_to_text  # noqa: E402
+from pipeline import generate_emails  # noqa: E402
+from portfolio import Portfolio  # noqa: E402
+from utils import clean_text  # noqa: E402
+from vector_index import ChromaIndex, NumpyIndex  # noqa: E402
+from fakes import FakeChatModel, HashingEmbeddingFunction  # noqa: E402
+
+PAGES = sorted(glob.glob(os.path.join(BENCH_DIR, "pages", "*.html")))
+PORTFOLIO_CSV = os.path.join(APP_DIR, "resource", "my_portfolio.csv")
+
+
+class FixtureFetcher:
+    """PageFetcher stand-in that serves fixture files by path."""
+
+    def fetch(self, url):
+        with open(url, encoding="utf-8") as f:
+            body = f.read()
+        return FetchedPage(url, body, hashlib.sha256(body.encode("utf-8")).hexdigest())
+
+    def clean(self, page):
+        page.cleaned = clean_text(page.text)
+        return page.cleaned
+
+
+class Timings:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.items = defaultdict(int)
+
+    def measure(self, stage, fn, *args, items=1, **kwargs):
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.samples[stage].append(time.perf_counter() - started)
+        self.items[stage] += items
+        return result
+
+    def summary(self):
+        rows = {}
+        for stage, samples in self.samples.items():
+            ordered = sorted(samples)
+            rows[stage] = {
+                "calls": len(samples),
+                "mean_ms": statistics.fmean(samples) * 1000,
+                "p50_ms": ordered[len(ordered) // 2] * 1000,
+                "p95_ms": ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000,
+                "items_per_s": self.items[stage] / sum(samples) if sum(samples) else 0.0,
+            }
+        return rows
+
+
+def fresh_portfolio(backend, embedding_function):
+    if backend == "numpy":
+        directory = tempfile.mkdtemp(prefix="bench-index-")
+        index = NumpyIndex(os.path.join(directory, "portfolio"), embedding_function)
+    else:
+        client = chromadb.EphemeralClient(Settings(anonymized_telemetry=False))
+        try:
+            client.delete_collection("portfolio")
+        except Exception:
+            pass
+        index = ChromaIndex(client, embedding_function=embedding_function)
+    return Portfolio(PORTFOLIO_CSV, index=index)
+
+
+def run(args):
+    timings = Timings()
+    chain = Chain(llm=FakeChatModel(latency=args.latency, tokens_per_second=args.tokens_per_second))
+    embedding_function = HashingEmbeddingFunction()
+    fetcher = FixtureFetcher()
+
+    for _ in range(args.repeat):
+        portfolio = fresh_portfolio(args.index, embedding_function)
+        timings.measure("load_portfolio", portfolio.load_portfolio, items=len(portfolio.data))
+
+        for path in PAGES:
+            with open(path, encoding="utf-8") as f:
+                html = f.read()
+            text = html_to_text(html)
+            cleaned = timings.measure("clean_text", clean_text, text)
+            jobs = timings.measure("extract_jobs", chain.extract_jobs, cleaned, use_cache=False)
+            skills = [job.get("skills", []) for job in jobs]
+            links = timings.measure("query_links", portfolio.query_links_batch, skills, items=len(jobs))
+            for job, job_links in zip(jobs, links):
+                timings.measure("write_mail", chain.write_mail, job, job_links, use_cache=False)
+            timings.measure("end_to_end", generate_emails, chain, portfolio, url=path,
+                            fetcher=fetcher, use_cache=False, max_workers=args.email_workers,
+                            items=len(jobs))
+    return timings.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake model time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=300.0, help="fake model generation rate")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--email-workers", type=int, default=4)
+    parser.add_argument("--index", choices=("numpy", "chroma"), default="numpy", help="portfolio index backend")
+    parser.add_argument("--json", help="also write the summary to this file")
+    args = parser.parse_args()
+
+    summary = run(args)
+    print(f"{'stage':<16} {'calls':>6} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10} {'items/s':>10}")
+    for stage, row in summary.items():
+        print(f"{stage:<16} {row['calls']:>6} {row['mean_ms']:>10.2f} {row['p50_ms']:>10.2f} "
+              f"{row['p95_ms']:>10.2f} {row['items_per_s']:>10.1f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
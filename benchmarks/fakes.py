@@ -0,0 +1,102 @@
+"""
+Offline Stand-ins for Benchmarks
+
+A deterministic chat model with configurable latency and token rate, and a
+hashing embedding function, so the pipeline can be measured without Groq,
+network access or embedding model downloads.
+"""
+
+import hashlib
+import json
+import math
+import re
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from fixtures import ROLES, SKILLS
+
+EMAIL_SENTENCES = [
+    "I came across your opening and wanted to introduce AtliQ.",
+    "We help engineering teams ship reliable software faster with dedicated experts.",
+    "Our consultants have delivered similar projects for clients across industries.",
+    "Happy to share case studies and set up a short call at your convenience.",
+]
+
+
+def fake_extraction(page_data):
+    """Jobs a perfect extractor would return for a fixture careers page."""
+    jobs = []
+    segments = re.split(r"Job ID", page_data)
+    for before, after in zip(segments, segments[1:]):
+        role = next((r for r in sorted(ROLES, key=len, reverse=True) if r in before[-200:]), "Software Engineer")
+        body = after[:600]
+        years = re.search(r"(\d+)\+ years", body)
+        jobs.append({
+            "role": role,
+            "experience": f"{years.group(1)}+ years" if years else "",
+            "skills": [skill for skill in SKILLS if re.search(rf"(?<![\w.]){re.escape(skill)}(?![\w+#])", body)],
+            "description": " ".join(body.split()[:40]),
+        })
+    return jobs
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that answers extraction and email prompts without a network.
+
+    Responses take ``latency`` seconds before the first token and then
+    arrive at ``tokens_per_second``, so both time-to-first-token and total
+    generation time behave like a hosted model.
+    """
+
+    latency: float = 0.2
+    tokens_per_second: float = 300.0
+    email_tokens: int = 180
+    model_name: str = "fake-chat"
+    temperature: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _respond(self, prompt: str) -> str:
+        if "### SCRAPED TEXT FROM WEBSITE:" in prompt:
+            page = prompt.split("### SCRAPED TEXT FROM WEBSITE:", 1)[1].split("### INSTRUCTION:", 1)[0]
+            return json.dumps(fake_extraction(page))
+        words = " ".join(EMAIL_SENTENCES).split()
+        return " ".join(words[i % len(words)] for i in range(self.email_tokens))
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        content = self._respond(messages[-1].content)
+        time.sleep(self.latency + (len(content) / 4) / self.tokens_per_second)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        content = self._respond(messages[-1].content)
+        time.sleep(self.latency)
+        for word in re.findall(r"\S+\s*", content):
+            time.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+
+
+class HashingEmbeddingFunction:
+    """Chroma-compatible embedding function based on hashed word features."""
+
+    def __init__(self, dimensions=256):
+        self.dimensions = dimensions
+
+    def __call__(self, input):
+        embeddings = []
+        for text in input:
+            vector = [0.0] * self.dimensions
+            for token in re.findall(r"[\w+#.]+", text.lower()):
+                digest = hashlib.md5(token.encode("utf-8")).digest()
+                vector[int.from_bytes(digest[:4], "little") % self.dimensions] += 1.0
+            norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+            embeddings.append([v / norm for v in vector])
+        return embeddings
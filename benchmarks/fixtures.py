@@ -0,0 +1,62 @@
+"""
+Benchmark Fixtures
+
+Deterministic synthetic careers pages, so benchmarks can run offline and
+produce comparable numbers across machines and commits.
+"""
+
+import random
+
+ROLES = [
+    "Senior Software Engineer", "Data Scientist", "Frontend Developer", "DevOps Engineer",
+    "Machine Learning Engineer", "Product Manager", "iOS Developer", "Backend Engineer (Go)",
+]
+SKILLS = [
+    "Python", "React", "Node.js", "C++", "C#", ".NET", "Kubernetes", "AWS", "TensorFlow",
+    "PostgreSQL", "Go", "Rust", "Swift", "CI/CD", "Spring Boot", "Vue.js", "Angular", "Kafka",
+]
+LOCATIONS = ["Bengaluru", "Zürich", "São Paulo", "München", "Remote", "New York", "東京"]
+
+PAGE_HEAD = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>Careers</title>
+<script>window.dataLayer = window.dataLayer || []; function gtag(){dataLayer.push(arguments);}</script>
+<style>.job{margin:0 auto;padding:1rem} .nav a{color:#333}</style></head>
+<body><nav class="nav"><a href="https://example.com/">Home</a> | <a href="https://example.com/about">About</a>
+| <a href="https://example.com/careers">Careers</a></nav>
+<div id="cookie-banner">We use cookies to improve your experience. <button>Accept all</button></div>
+<main><h1>Join our team</h1>
+"""
+
+PAGE_TAIL = """</main>
+<footer><p>&copy; 2024 Example Corp. All rights reserved.</p>
+<a href="https://example.com/privacy">Privacy</a> · <a href="https://example.com/terms">Terms</a></footer>
+</body></html>
+"""
+
+
+def posting_html(rng, index):
+    role = rng.choice(ROLES)
+    skills = rng.sample(SKILLS, 4)
+    return f"""<section class="job" id="job-{index}">
+  <h2>{role} – {rng.choice(LOCATIONS)}</h2>
+  <p class="meta">Job ID: R{100000 + index} · {rng.randint(1, 10)}+ years experience · Full-time</p>
+  <p>We are looking for a {role.lower()} to build and run services used by millions of customers.
+  You will work with {", ".join(skills[:-1])} and {skills[-1]} in a cross-functional team.</p>
+  <h3>Requirements</h3>
+  <ul>{"".join(f"<li>Hands-on experience with {skill}</li>" for skill in skills)}</ul>
+  <a class="apply" href="https://example.com/careers/{index}/apply?src=board">Apply now &rarr;</a>
+</section>
+"""
+
+
+def careers_page(postings=10, seed=0):
+    """Return a careers page HTML document with ``postings`` job sections."""
+    rng = random.Random(seed)
+    return PAGE_HEAD + "".join(posting_html(rng, i) for i in range(postings)) + PAGE_TAIL
+
+
+def careers_page_of_size(target_bytes, seed=0):
+    """Return a careers page of roughly ``target_bytes`` UTF-8 bytes."""
+    sample = careers_page(10, seed)
+    per_posting = max(len(sample.encode("utf-8")) // 10, 1)
+    return careers_page(max(target_bytes // per_posting, 1), seed)